@@ -0,0 +1,173 @@
+import asyncio
+
+from hid_gamepad import hid_gamepad
+
+
+class async_gamepad():
+    """asyncio interface around a hid_gamepad. Iterating over the object with
+    "async for" yields a new "gamepad_state" snapshot every time the state of
+    the gamepad changes, "events" yields the gamepad events.
+
+    When the device provides a file descriptor (e.g. the hidraw backend on
+    Linux) it is registered with the event loop and reports are processed on
+    the loop as soon as they arrive, without any extra thread. Otherwise the
+    blocking reads run in the default executor of the loop.
+
+    Output reports queued with "write_output" or "send_feature_report" of
+    this object are written from the loop, at the rate limit of the gamepad,
+    even while the device sends no reports."""
+
+    def __init__(self, gamepad=None, timeout=0.1):
+        self.gamepad = gamepad if gamepad is not None else hid_gamepad()
+        self.timeout = timeout
+        self._loop = None
+        self._fileno = None
+        self._poll_task = None
+        self._flush_handle = None
+        self._waiters = []
+        self._closed = False
+
+    def __aiter__(self):
+        return self.states()
+
+    async def connect(self, target_device, backend=None):
+        """Connects with the device (see "hid_gamepad.connect") and starts
+        delivering its reports. Returns True if connected."""
+
+        loop = asyncio.get_running_loop()
+        connected = await loop.run_in_executor(None, self.gamepad.connect, target_device, backend)
+        if connected:
+            self._start_reader(loop)
+        return connected
+
+    async def reconnect(self):
+        """Reconnects previously connected device and resumes delivering its reports."""
+
+        loop = asyncio.get_running_loop()
+        connected = await loop.run_in_executor(None, self.gamepad.reconnect)
+        if connected:
+            self._start_reader(loop)
+        return connected
+
+    def write_output(self, report):
+        """Queues an output report (see "hid_gamepad.write_output") and schedules
+        its write on the loop. Must be called from the loop thread."""
+
+        queued = self.gamepad.write_output(report)
+        if queued:
+            self._schedule_flush()
+        return queued
+
+    def send_feature_report(self, report):
+        """Queues a feature report, see "write_output"."""
+
+        queued = self.gamepad.send_feature_report(report)
+        if queued:
+            self._schedule_flush()
+        return queued
+
+    def close(self):
+        """Stops delivering reports and ends all running iterations. The
+        gamepad itself stays connected."""
+
+        self._closed = True
+        self._stop_reader()
+        self._notify()
+
+    async def states(self):
+        """Yields the state snapshot every time it changes. A consumer slower
+        than the device gets the newest snapshot, intermediate ones are skipped."""
+
+        sequence = self.gamepad.get_state().sequence
+        while not self._closed:
+            state = self.gamepad.get_state()
+            if state.sequence != sequence:
+                sequence = state.sequence
+                yield state
+            else:
+                await self._wait()
+
+    async def events(self, max_events=256, axis_threshold=0.01):
+        """Yields the gamepad events as they are recorded. Events are enabled on
+        the gamepad if they were not enabled yet."""
+
+        if not self.gamepad.events_enabled:
+            self.gamepad.enable_events(max_events, axis_threshold)
+        while not self._closed:
+            events = self.gamepad.get_events()
+            if events:
+                for event in events:
+                    yield event
+            else:
+                await self._wait()
+
+    def _start_reader(self, loop):
+        self._stop_reader()
+        self._closed = False
+        self._loop = loop
+        self._fileno = self.gamepad.device_fileno()
+        if self._fileno is not None:
+            loop.add_reader(self._fileno, self._on_readable)
+        else:
+            self._poll_task = loop.create_task(self._poll())
+
+    def _stop_reader(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._fileno is not None:
+            self._loop.remove_reader(self._fileno)
+            self._fileno = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+    def _on_readable(self):
+        self._drain(self.gamepad.read_raw_bits())
+        if not self.gamepad.is_connected:
+            self._stop_reader()
+            self._notify()
+        elif self._flush_handle is None:
+            # read_raw_bits flushed what was due, schedule the rest
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        # the executor reads of the polling path flush the queue themselves
+        if self._fileno is None or self._flush_handle is not None:
+            return
+        delay = self.gamepad.flush_output()
+        if delay is not None:
+            self._flush_handle = self._loop.call_later(delay, self._on_flush)
+
+    def _on_flush(self):
+        self._flush_handle = None
+        if self.gamepad.is_connected:
+            self._schedule_flush()
+
+    async def _poll(self):
+        timeout_ms = max(1, int(self.timeout * 1000))
+        while self.gamepad.is_connected:
+            report = await self._loop.run_in_executor(None, self.gamepad.read_raw_bits, timeout_ms)
+            self._drain(report)
+        self._poll_task = None
+        self._notify()
+
+    def _drain(self, report):
+        changed = False
+        while report:
+            changed = self.gamepad.apply_report(report) or changed
+            report = self.gamepad.read_raw_bits()
+        if changed:
+            self._notify()
+
+    async def _wait(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        await waiter
+
+    def _notify(self):
+        waiters = self._waiters
+        self._waiters = []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
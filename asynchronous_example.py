@@ -1,6 +1,5 @@
 from hid_gamepad import hid_gamepad
 from hid_gamepad import list_gamepads
-import time
 
 if __name__ == "__main__":
 
@@ -19,13 +18,13 @@ if __name__ == "__main__":
         if my_gamepad.connect(available_gamepads[selected_gamepad]):
             print("\nConnection established with selected gampad.")
             print("Reporting gampad raw input states.")
+            my_gamepad.start_supervisor()
             my_gamepad.start_asynchronous()
             while True:
                 if my_gamepad.is_connected:
                     # time.sleep(100/1000)
                     print(my_gamepad.raw_inputs)
                 else:
-                    my_gamepad.reconnect()
-                    time.sleep(2000/1000)
+                    my_gamepad.wait_connected()
     else:
         print("\nUnable to find gamped devices.")
\ No newline at end of file
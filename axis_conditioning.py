@@ -0,0 +1,168 @@
+import math
+
+
+# Largest raw axis field, in bits, for which a lookup table is precomputed
+MAX_TABLE_BITS = 16
+# Distance below which a smoothed axis snaps to its input value
+SMOOTHING_TOLERANCE = 1e-4
+
+
+class axis_conditioning():
+    """Conditioning of one axis: calibration of the raw "minimum", "center" and
+    "maximum" values, an axial "deadzone" around the center, an "outer_deadzone"
+    near the ends of the range, a response "curve" and inversion. Every step
+    only depends on the raw value, so they are combined into one lookup table
+    per axis and cost a single table lookup per report.
+
+    The calibrated value is in the -1.0 to 1.0 range. Values inside "deadzone"
+    become 0.0, values inside "outer_deadzone" of the ends become -1.0 or 1.0
+    and the rest of the range is stretched to keep the response continuous.
+    "curve" is either an exponent applied to the magnitude (1.0 is linear,
+    larger values give finer control near the center) or a function mapping a
+    value of the -1.0 to 1.0 range to a new value.
+
+    "smoothing" sets the weight of the previous value in an exponential moving
+    average applied to each report (0.0 disables it). Smoothing has a state, so
+    it runs after the table lookup. Until the smoothed value has settled, even
+    unchanged reports are decoded, so the axis follows a stick which is
+    released and held still as long as the device keeps sending reports."""
+
+    def __init__(self, minimum=None, center=None, maximum=None, deadzone=0.0, outer_deadzone=0.0,
+                 curve=1.0, invert=False, smoothing=0.0):
+        if not 0.0 <= deadzone < 1.0 - outer_deadzone or outer_deadzone < 0.0:
+            raise ValueError('Deadzones must leave part of the axis range active')
+        if not 0.0 <= smoothing < 1.0:
+            raise ValueError('Smoothing must be in the 0.0 to 1.0 range')
+        self.minimum = minimum
+        self.center = center
+        self.maximum = maximum
+        self.deadzone = deadzone
+        self.outer_deadzone = outer_deadzone
+        self.curve = curve
+        self.invert = invert
+        self.smoothing = smoothing
+
+    def calibrate(self, field, raw):
+        """Returns the calibrated value of the "raw" value of an axis field."""
+
+        if field.lookup is not None:
+            return field.lookup[raw]
+        center = field.center if self.center is None else self.center
+        if raw < center:
+            span = field.scale if self.minimum is None else center - self.minimum
+        else:
+            span = field.scale if self.maximum is None else self.maximum - center
+        if span <= 0:
+            return 0.0
+        return max(-1.0, min(1.0, (raw - center) / span))
+
+    def shape(self, value):
+        """Applies the deadzones, the response curve and inversion to a calibrated value."""
+
+        magnitude = abs(value)
+        if magnitude <= self.deadzone:
+            value = 0.0
+        elif magnitude >= 1.0 - self.outer_deadzone:
+            value = math.copysign(1.0, value)
+        else:
+            value = math.copysign((magnitude - self.deadzone) / (1.0 - self.outer_deadzone - self.deadzone), value)
+        if callable(self.curve):
+            value = float(self.curve(value))
+        elif self.curve != 1.0:
+            value = math.copysign(abs(value) ** self.curve, value)
+        return -value if self.invert else value
+
+    def lookup_table(self, field):
+        """Returns the lookup table of an axis field, indexed by raw value.
+        Negative raw values of signed fields index the table from its end."""
+
+        bits = (field.mask >> field.shift).bit_length()
+        if bits > MAX_TABLE_BITS:
+            raise ValueError(f'Axis {field.name} is too wide for a lookup table ({bits} bits)')
+        size = 1 << bits
+        if field.lookup is not None:
+            size = len(field.lookup)
+        if field.signed:
+            raws = [raw - size if raw >= size // 2 else raw for raw in range(size)]
+        else:
+            raws = range(size)
+        return tuple(self.shape(self.calibrate(field, raw)) for raw in raws)
+
+
+class radial_deadzone():
+    """Deadzone of a stick made of two axes. The stick is centered while the
+    length of its (x, y) vector is within "deadzone" and at full deflection
+    beyond "1.0 - outer_deadzone". In between, the length is stretched to keep
+    the response continuous while the direction is kept."""
+
+    def __init__(self, deadzone=0.0, outer_deadzone=0.0):
+        if not 0.0 <= deadzone < 1.0 - outer_deadzone or outer_deadzone < 0.0:
+            raise ValueError('Deadzones must leave part of the stick range active')
+        self.deadzone = deadzone
+        self.outer_deadzone = outer_deadzone
+
+    def apply(self, x, y):
+        magnitude = math.hypot(x, y)
+        if magnitude <= self.deadzone:
+            return 0.0, 0.0
+        scaled = min(1.0, (magnitude - self.deadzone) / (1.0 - self.outer_deadzone - self.deadzone))
+        return x * scaled / magnitude, y * scaled / magnitude
+
+
+def condition_layout(layout, conditionings):
+    """Returns a copy of "layout" in which the axes named in the "conditionings"
+    dictionary read their values from the precomputed lookup tables."""
+
+    lookups = {field.name: conditionings[field.name].lookup_table(field)
+               for field in layout.axes if field.name in conditionings}
+    return layout.with_lookups(lookups)
+
+
+def compile_filter(axis_mapping, conditionings, sticks):
+    """Compiles the conditioning steps which depend on more than the raw value
+    of one axis, i.e. radial deadzones of the "sticks" dictionary, keyed by
+    (x name, y name) pairs, and smoothing, into a function "axis_filter(axes)"
+    updating the axis list in place. The filter returns True while a smoothed
+    axis has not yet settled on its input value, in which case unchanged
+    reports must still be filtered. Returns None when there is nothing to do."""
+
+    steps = []
+    for (x_name, y_name), deadzone in sticks.items():
+        if x_name in axis_mapping and y_name in axis_mapping:
+            steps.append(_stick_step(axis_mapping[x_name], axis_mapping[y_name], deadzone))
+    for name, conditioning in conditionings.items():
+        if name in axis_mapping and conditioning.smoothing:
+            steps.append(_smoothing_step(axis_mapping[name], conditioning.smoothing))
+    if not steps:
+        return None
+
+    def axis_filter(axes):
+        settling = False
+        for step in steps:
+            if step(axes):
+                settling = True
+        return settling
+
+    return axis_filter
+
+
+def _stick_step(x_index, y_index, deadzone):
+    def step(axes):
+        axes[x_index], axes[y_index] = deadzone.apply(axes[x_index], axes[y_index])
+        return False
+    return step
+
+
+def _smoothing_step(index, smoothing):
+    smoothed = [None]
+
+    def step(axes):
+        value = axes[index]
+        if smoothed[0] is None or abs(value - smoothed[0]) < SMOOTHING_TOLERANCE:
+            # settled, snap to the input value
+            smoothed[0] = value
+            return False
+        smoothed[0] += (value - smoothed[0]) * (1.0 - smoothing)
+        axes[index] = smoothed[0]
+        return True
+    return step
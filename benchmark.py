@@ -0,0 +1,222 @@
+"""Benchmark of the report decoding and of the end-to-end input latency of
+hid_gamepad and microntek_gamepad, driven by a simulated device.
+
+Usage example:
+    python benchmark.py --rates 125 1000 8000 --modes poll async --output results.json
+
+Results are printed (or written to the output file) as JSON."""
+
+import argparse
+import contextlib
+import itertools
+import json
+import platform
+import sys
+import time
+
+from hid_backends import synthetic_backend
+from hid_gamepad import hid_gamepad
+from microntek_gamepad import microntek_gamepad
+
+
+# Descriptor of a generic USB gamepad: 5 axes, an 8-way hat switch and 12 buttons
+GENERIC_DESCRIPTOR = bytes.fromhex(
+    '05 01 09 04 a1 01 a1 02 75 08 95 05 15 00 26 ff 00 35 00 46 ff 00 09 30 09 30 09 30 09 30 09 31'
+    ' 81 02 75 04 95 01 25 07 46 3b 01 65 14 09 39 81 42 65 00 75 01 95 0c 25 01 45 01 05 09 19 01'
+    ' 29 0c 81 02 06 00 ff 75 01 95 08 25 01 45 01 09 01 81 02 c0 a1 02 75 08 95 07 46 ff 00 26 ff'
+    ' 00 09 02 91 02 c0 c0')
+
+DEVICES = {
+    'hid_gamepad': (hid_gamepad, GENERIC_DESCRIPTOR,
+                    [bytes([i, 255 - i, 128, 128, 128, 0x0F | (i & 0xF0), i, 0]) for i in range(256)]),
+    'microntek_gamepad': (microntek_gamepad, None,
+                          [bytes([1, i, 255 - i, 128, 128, 0x0F | (i & 0xF0), i, 0]) for i in range(256)]),
+}
+
+
+class run_statistics():
+    """Counters of one benchmark run shared by the simulated devices."""
+
+    def __init__(self):
+        self.reports_read = 0
+        self.reports_applied = 0
+        self.latencies = []
+        self.due_times = {}
+
+
+class timed_device():
+    """Simulated device recording when each report it returns became available."""
+
+    def __init__(self, device, statistics):
+        self._device = device
+        self._statistics = statistics
+
+    def read(self, max_length, timeout_ms=0):
+        report = self._device.read(max_length, timeout_ms)
+        if report:
+            self._statistics.reports_read += 1
+            self._statistics.due_times[id(report)] = self._device.due_time
+        return report
+
+    def get_report_descriptor(self, max_length=4096):
+        return self._device.get_report_descriptor(max_length)
+
+    def close(self):
+        self._device.close()
+
+
+class timed_backend(synthetic_backend):
+
+    def __init__(self, reports, rate, statistics, report_descriptor=None):
+        super().__init__(reports, rate, {'manufacturer_string': 'microntek', 'path': b'benchmark',
+                                         'vendor_id': 0, 'product_id': 0}, report_descriptor)
+        self._statistics = statistics
+
+    def open(self, target_device):
+        return timed_device(super().open(target_device), self._statistics)
+
+
+def timed_gamepad(gamepad_class, statistics):
+    """Returns an instance of "gamepad_class" measuring the latency between the
+    moment a report became available and the moment its state was published."""
+
+    class timed(gamepad_class):
+
+        def apply_report(self, raw_inputs, timestamp=None):
+            changed = super().apply_report(raw_inputs, timestamp)
+            published = time.monotonic_ns()
+            due_time = statistics.due_times.pop(id(raw_inputs), None)
+            statistics.reports_applied += 1
+            if due_time is not None:
+                statistics.latencies.append(published - due_time)
+            return changed
+
+    return timed()
+
+
+def benchmark_decode(name, count):
+    """Measures the cost of "apply_report" (compare, decode and publish) and of
+    "process_inputs" alone for "count" distinct reports."""
+
+    gamepad_class, descriptor, reports = DEVICES[name]
+    backend = synthetic_backend(reports, None, {'manufacturer_string': 'microntek'}, descriptor)
+    gamepad = gamepad_class(backend)
+    gamepad.connect(backend.enumerate()[0])
+    cycle = itertools.islice(itertools.cycle(reports), count)
+
+    start = time.perf_counter_ns()
+    for report in cycle:
+        gamepad.apply_report(report)
+    apply_ns = (time.perf_counter_ns() - start) / count
+
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        gamepad.process_inputs()
+    process_ns = (time.perf_counter_ns() - start) / count
+
+    gamepad.disconnect()
+    return {'device': name, 'reports': count,
+            'apply_report_ns': round(apply_ns, 1), 'process_inputs_ns': round(process_ns, 1),
+            'reports_per_second': round(1e9 / apply_ns)}
+
+
+def benchmark_run(name, mode, rate, devices, duration, poll_interval):
+    """Runs "devices" simulated gamepads at "rate" reports per second for
+    "duration" seconds, either polling them with "update_state" ("poll") or
+    with "start_asynchronous" ("async" or "async_latest")."""
+
+    gamepad_class, descriptor, reports = DEVICES[name]
+    statistics = run_statistics()
+    gamepads = []
+    for _ in range(devices):
+        backend = timed_backend(itertools.cycle(reports), rate, statistics, descriptor)
+        gamepad = timed_gamepad(gamepad_class, statistics)
+        gamepad.connect(backend.enumerate()[0], backend)
+        gamepads.append(gamepad)
+
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    if mode == 'poll':
+        while time.monotonic() - start < duration:
+            for gamepad in gamepads:
+                gamepad.update_state()
+            if poll_interval > 0:
+                time.sleep(poll_interval)
+    else:
+        policy = hid_gamepad.PROCESS_LATEST if mode == 'async_latest' else hid_gamepad.PROCESS_ALL
+        for gamepad in gamepads:
+            gamepad.start_asynchronous(policy, timeout=0.01)
+        time.sleep(duration)
+        for gamepad in gamepads:
+            gamepad.stop_asynchronous()
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu_start
+    for gamepad in gamepads:
+        gamepad.disconnect()
+
+    generated = int(rate * elapsed) * devices
+    latencies = sorted(statistics.latencies)
+    return {
+        'device': name, 'mode': mode, 'rate': rate, 'devices': devices,
+        'duration': round(elapsed, 3),
+        'reports_generated': generated,
+        'reports_read': statistics.reports_read,
+        'reports_applied': statistics.reports_applied,
+        'reports_coalesced': statistics.reports_read - statistics.reports_applied,
+        'reports_not_read': max(0, generated - statistics.reports_read),
+        'latency_us': {
+            'mean': _microseconds(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': _microseconds(_percentile(latencies, 0.50)),
+            'p99': _microseconds(_percentile(latencies, 0.99)),
+            'max': _microseconds(latencies[-1]) if latencies else None,
+        },
+        'cpu_percent_per_device': round(100 * cpu / elapsed / devices, 2),
+    }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _microseconds(nanoseconds):
+    return None if nanoseconds is None else round(nanoseconds / 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hid_gamepad benchmark')
+    parser.add_argument('--devices', type=int, nargs='+', default=[1])
+    parser.add_argument('--rates', type=int, nargs='+', default=[125, 1000, 8000])
+    parser.add_argument('--modes', nargs='+', default=['poll', 'async', 'async_latest'],
+                        choices=['poll', 'async', 'async_latest'])
+    parser.add_argument('--gamepads', nargs='+', default=list(DEVICES), choices=list(DEVICES))
+    parser.add_argument('--duration', type=float, default=1.0)
+    parser.add_argument('--poll-interval', type=float, default=0.001)
+    parser.add_argument('--decode-reports', type=int, default=100000)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+
+    # messages printed by the gamepads go to stderr, the results to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        results = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'decode': [benchmark_decode(name, arguments.decode_reports) for name in arguments.gamepads],
+            'runs': [benchmark_run(name, mode, rate, devices, arguments.duration, arguments.poll_interval)
+                     for name in arguments.gamepads
+                     for mode in arguments.modes
+                     for rate in arguments.rates
+                     for devices in arguments.devices],
+        }
+
+    output = json.dumps(results, indent=2)
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
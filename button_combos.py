@@ -0,0 +1,116 @@
+class combo_engine():
+    """Detects button chords and sequences from the button bitmask of each
+    report (see "gamepad_state.button_mask").
+
+    Combos are compiled into masks when they are added. A chord fires when
+    all of its buttons are held, optionally only if they were all pressed
+    within "window" seconds. A sequence is a timed state machine which fires
+    when its steps, each a button or a chord, are pressed in order with at
+    most "timeout" seconds between two steps. Combos only advance on newly
+    pressed buttons, so reports without presses cost a single mask test."""
+
+    def __init__(self, button_mapping):
+        self._button_mapping = dict(button_mapping)
+        self._chords = []
+        self._sequences = []
+        self._watched = 0
+        self._previous = 0
+
+    def button_mask(self, buttons):
+        """Returns the bitmask of the buttons given by name or index."""
+
+        if isinstance(buttons, (str, int)):
+            buttons = [buttons]
+        mask = 0
+        for button in buttons:
+            if button in self._button_mapping:
+                mask |= 1 << self._button_mapping[button]
+            else:
+                try:
+                    mask |= 1 << int(button)
+                except ValueError:
+                    raise ValueError('Button name %s was not found' % button)
+        return mask
+
+    def add_chord(self, name, buttons, window=None):
+        """Adds a chord named "name" of the given buttons."""
+
+        mask = self.button_mask(buttons)
+        window_ns = None if window is None else int(window * 1e9)
+        # [name, mask, window, time of the first press of the attempt]
+        self._chords.append([name, mask, window_ns, None])
+        self._watched |= mask
+
+    def add_sequence(self, name, steps, timeout=0.5):
+        """Adds a sequence named "name" of "steps", each a button name or index
+        or a list of them pressed together."""
+
+        masks = tuple(self.button_mask(step) for step in steps)
+        if not masks:
+            raise ValueError('A sequence needs at least one step')
+        # [name, step masks, timeout, index of the next step, deadline of the next step]
+        self._sequences.append([name, masks, int(timeout * 1e9), 0, 0])
+        # any press can break a sequence, so all buttons are watched
+        self._watched = -1
+
+    def remove(self, name):
+        self._chords = [chord for chord in self._chords if chord[0] != name]
+        self._sequences = [sequence for sequence in self._sequences if sequence[0] != name]
+        self._watched = -1 if self._sequences else 0
+        for chord in self._chords:
+            self._watched |= chord[1]
+
+    def reset(self):
+        """Forgets the progress of all combos."""
+
+        self._previous = 0
+        for chord in self._chords:
+            chord[3] = None
+        for sequence in self._sequences:
+            sequence[3] = 0
+
+    def update(self, mask, timestamp):
+        """Processes the button bitmask of a report taken at "timestamp"
+        nanoseconds. Returns the list of names of the combos which fired."""
+
+        previous = self._previous
+        self._previous = mask
+        pressed = mask & ~previous & self._watched
+        if not pressed:
+            if previous & ~mask:
+                for chord in self._chords:
+                    if not mask & chord[1]:
+                        chord[3] = None
+            return []
+
+        fired = []
+        for chord in self._chords:
+            chord_mask = chord[1]
+            if not pressed & chord_mask:
+                continue
+            if chord[3] is None or not previous & chord_mask:
+                chord[3] = timestamp
+            if mask & chord_mask == chord_mask:
+                if chord[2] is None or timestamp - chord[3] <= chord[2]:
+                    fired.append(chord[0])
+                chord[3] = None
+
+        for sequence in self._sequences:
+            steps = sequence[1]
+            index = sequence[3]
+            if index and timestamp > sequence[4]:
+                index = 0
+            step = steps[index]
+            # a press of part of a chord step waits for the rest of the chord
+            if mask & step == step and pressed & step:
+                index += 1
+            elif mask & steps[0] == steps[0] and pressed & steps[0]:
+                index = 1
+            elif pressed & ~step:
+                index = 0
+            if index == len(steps):
+                fired.append(sequence[0])
+                index = 0
+            sequence[3] = index
+            sequence[4] = timestamp + sequence[2]
+        return fired
@@ -0,0 +1,284 @@
+import queue
+import threading
+import time
+
+from gamepad_events import AXIS_MOVED
+
+
+class subscription():
+    """Subscription of a callback to gamepad events. Created by
+    "event_dispatcher.subscribe"."""
+
+    def __init__(self, callback, names=None, kinds=None, threshold=0.0, rate_limit=None, batch=False):
+        self.callback = callback
+        self.names = frozenset(names) if names is not None else None
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.threshold = threshold
+        self.rate_limit = rate_limit
+        self.batch = batch
+        self._axis_values = {}
+        self._last_delivery = {}
+        self._trailing = {}
+
+    def _accepts(self, event, now):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return False
+        if event.kind != AXIS_MOVED:
+            return True
+        last_value = self._axis_values.get(event.name)
+        if last_value is not None and abs(event.value - last_value) < self.threshold:
+            self._trailing.pop(event.name, None)
+            return False
+        if self.rate_limit is not None:
+            last_delivery = self._last_delivery.get(event.name)
+            if last_delivery is not None and now - last_delivery < self.rate_limit:
+                # the latest suppressed move is delivered when the window expires
+                self._trailing[event.name] = event
+                return False
+            self._last_delivery[event.name] = now
+            self._trailing.pop(event.name, None)
+        self._axis_values[event.name] = event.value
+        return True
+
+    def _due_trailing(self, now):
+        """Returns the suppressed axis moves whose rate limit window expired."""
+
+        due = [event for name, event in self._trailing.items()
+               if now - self._last_delivery[name] >= self.rate_limit]
+        for event in due:
+            del self._trailing[event.name]
+            self._last_delivery[event.name] = now
+            self._axis_values[event.name] = event.value
+        return due
+
+    def _trailing_deadline(self):
+        if not self._trailing:
+            return None
+        return min(self._last_delivery[name] for name in self._trailing) + self.rate_limit
+
+
+class event_dispatcher():
+    """Delivers gamepad events to subscribed callbacks away from the thread
+    reading the device. The reader only puts the events of each report in a
+    bounded queue, a dispatcher thread (or the given "executor") filters them
+    and calls the callbacks, so slow callbacks never delay report reading.
+    When the queue is full, the events of new reports are dropped and counted
+    in "dropped_batches". With an executor, one task at a time drains the
+    queue, so events are delivered in order and callbacks of one dispatcher
+    never run concurrently.
+
+    Subscriptions are indexed by axis and button names, so a callback is only
+    woken for events of the names it subscribed to."""
+
+    class dispatch_thread(threading.Thread):
+        """Thread delivering the queued events of a dispatcher. One of these is
+        created by the dispatcher start function and closed by stop."""
+
+        def __init__(self, dispatcher):
+            threading.Thread.__init__(self)
+            self.dispatcher = dispatcher
+            self.daemon = True
+            self.running = True
+
+        def run(self):
+            try:
+                while self.running:
+                    # wake up in time for the trailing moves of rate limited subscriptions
+                    try:
+                        events = self.dispatcher._queue.get(timeout=self.dispatcher._trailing_delay())
+                    except queue.Empty:
+                        events = ()
+                    if events is None:
+                        break
+                    try:
+                        self.dispatcher.dispatch(events)
+                    except Exception as error:
+                        print(f'Event callback failed: {error!r}')
+            finally:
+                self.running = False
+                self.dispatcher = None
+
+    def __init__(self, executor=None, max_pending=1024):
+        self._executor = executor
+        self._queue = queue.Queue(max_pending)
+        self._by_name = {}
+        self._any_name = []
+        self._rate_limited = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._drain_lock = threading.Lock()
+        self._draining = False
+        self._timer = None
+        self._timer_deadline = None
+        self.dropped_batches = 0
+
+    @property
+    def pending(self):
+        """Number of reports whose events are waiting for delivery."""
+
+        return self._queue.qsize()
+
+    def subscribe(self, callback, names=None, kinds=None, threshold=0.0, rate_limit=None, batch=False):
+        """Subscribes "callback" to the events of the given axis and button
+        "names" (all names if None) and event "kinds" (all kinds if None).
+        Axis moves smaller than "threshold" since the last delivered value are
+        skipped, and with "rate_limit" set at most one axis move per axis is
+        delivered every "rate_limit" seconds; the latest move suppressed by
+        the rate limit is delivered when the window expires, so the callback
+        always ends up with the final value. Button events are never skipped.
+        The callback is called with each event, or with the list of matching
+        events of a report if "batch" is set. Returns the subscription."""
+
+        entry = subscription(callback, names, kinds, threshold, rate_limit, batch)
+        with self._lock:
+            if entry.names is None:
+                self._any_name = self._any_name + [entry]
+            else:
+                for name in entry.names:
+                    self._by_name[name] = self._by_name.get(name, []) + [entry]
+            if entry.rate_limit is not None:
+                self._rate_limited = self._rate_limited + [entry]
+        return entry
+
+    def unsubscribe(self, entry):
+        with self._lock:
+            self._any_name = [item for item in self._any_name if item is not entry]
+            self._rate_limited = [item for item in self._rate_limited if item is not entry]
+            for name in list(self._by_name):
+                entries = [item for item in self._by_name[name] if item is not entry]
+                if entries:
+                    self._by_name[name] = entries
+                else:
+                    del self._by_name[name]
+
+    def post(self, events):
+        """Queues the events of one report for delivery. Never blocks."""
+
+        if not events:
+            return
+        try:
+            self._queue.put_nowait(events)
+        except queue.Full:
+            self.dropped_batches += 1
+            return
+        if self._executor is not None:
+            self._submit_drain()
+
+    def _submit_drain(self):
+        with self._drain_lock:
+            if self._draining:
+                return
+            self._draining = True
+        self._executor.submit(self._drain)
+
+    def _drain(self):
+        """Executor task delivering the queued events. Only one runs at a time."""
+
+        events = ()
+        while True:
+            try:
+                self.dispatch(events)
+            except Exception as error:
+                print(f'Event callback failed: {error!r}')
+            with self._drain_lock:
+                try:
+                    events = self._queue.get_nowait()
+                    continue
+                except queue.Empty:
+                    pass
+                # still the only drain, so the filter state can be read safely
+                delay = self._trailing_delay()
+                if delay is not None:
+                    self._arm_timer(delay)
+                self._draining = False
+                return
+
+    def _arm_timer(self, delay):
+        """Schedules a drain for the next trailing axis move, unless one is
+        already scheduled earlier. Called with "_drain_lock" held."""
+
+        deadline = time.monotonic() + delay
+        if self._timer is not None:
+            if self._timer_deadline <= deadline:
+                return
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.args = (self._timer,)
+        self._timer.daemon = True
+        self._timer_deadline = deadline
+        self._timer.start()
+
+    def _on_timer(self, timer):
+        with self._drain_lock:
+            if self._timer is not timer:
+                return
+            self._timer = None
+        self._submit_drain()
+
+    def _trailing_delay(self):
+        """Returns the seconds until the next trailing axis move is due, or None."""
+
+        deadlines = [deadline for deadline in (entry._trailing_deadline() for entry in self._rate_limited)
+                     if deadline is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    @property
+    def running(self):
+        """True if queued events are being delivered, by the dispatcher thread or the executor."""
+
+        return self._executor is not None or (self._thread is not None and self._thread.running)
+
+    def start(self):
+        """Starts the dispatcher thread. Not needed when an executor is used."""
+
+        if self._executor is not None:
+            return
+        if self._thread is not None and self._thread.running:
+            raise RuntimeError('Event dispatcher is already running')
+        self._thread = event_dispatcher.dispatch_thread(self)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the dispatcher thread once the events queued so far are
+        delivered and waits for it. Called from a callback, the thread stops
+        after the current delivery and the remaining events stay queued."""
+
+        with self._drain_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        thread = self._thread
+        if thread is not None:
+            self._thread = None
+            if thread is threading.current_thread():
+                thread.running = False
+            else:
+                self._queue.put(None)
+                thread.join()
+
+    def dispatch(self, events):
+        """Delivers the events of one report to the matching subscriptions,
+        after the trailing axis moves of rate limited subscriptions which are due."""
+
+        now = time.monotonic()
+        by_name = self._by_name
+        any_name = self._any_name
+        batches = {}
+        for entry in self._rate_limited:
+            if entry._trailing:
+                for event in entry._due_trailing(now):
+                    if entry.batch:
+                        batches.setdefault(entry, []).append(event)
+                    else:
+                        entry.callback(event)
+        for event in events:
+            for entry in by_name.get(event.name, []) + any_name:
+                if entry._accepts(event, now):
+                    if entry.batch:
+                        batches.setdefault(entry, []).append(event)
+                    else:
+                        entry.callback(event)
+        for entry, matched in batches.items():
+            entry.callback(matched)
@@ -0,0 +1,35 @@
+from collections import namedtuple
+
+
+gamepad_state = namedtuple('gamepad_state', 'sequence timestamp raw_inputs axes buttons button_mask',
+                           defaults=(0,))
+gamepad_state.__doc__ = """Immutable snapshot of the gamepad state. The "sequence" number grows by one
+with every published report and "timestamp" is the monotonic time of the report
+in nanoseconds. Raw inputs are kept as bytes, axis and button states are tuples
+ordered by their indexes and "button_mask" holds the button states as an integer
+with bit "n" set when the button with index "n" is pressed."""
+
+
+gamepad_frame = namedtuple('gamepad_frame', 'sequence timestamp axes buttons')
+gamepad_frame.__doc__ = """Whole state of a gamepad as returned by "hid_gamepad.get_frame". The
+"axes" and "buttons" are named records with one field per axis and button."""
+
+
+gamepad_tick = namedtuple('gamepad_tick', 'timestamp state pressed released transitions dropped')
+gamepad_tick.__doc__ = """State of a gamepad at a tick, as returned by "hid_gamepad.get_tick". "state"
+is the newest snapshot at or before "timestamp", "pressed" and "released" are
+bitmasks of the buttons pressed or released at least once since the previous
+tick and "transitions" lists those button events in order. "dropped" counts
+the snapshots lost because more than the tick capacity arrived in between."""
+
+
+gamepad_event = namedtuple('gamepad_event', 'timestamp sequence kind name value')
+gamepad_event.__doc__ = """Change of a single button or axis. The "kind" is one of BUTTON_DOWN,
+BUTTON_UP or AXIS_MOVED, or COMBO for a chord or sequence detected by the combo
+engine. "timestamp" and "sequence" are those of the state snapshot in which the
+change was seen."""
+
+BUTTON_DOWN = 'button_down'
+BUTTON_UP = 'button_up'
+AXIS_MOVED = 'axis_moved'
+COMBO = 'combo'
@@ -0,0 +1,175 @@
+import selectors
+import threading
+import time
+
+
+class gamepad_manager():
+    """Services many connected gamepads from one I/O loop. Gamepads whose
+    device provides a file descriptor are waited on with a single selector,
+    so the loop only wakes up when one of them has sent a report. Only the
+    "hidraw_backend" provides file descriptors; gamepads of other backends
+    are polled every "poll_interval" seconds (1 ms by default), which keeps
+    the loop busy, so use "hidraw_backend" for the selector path.
+
+    Every changed state is fanned out to the consumers of its gamepad, which
+    are called as "consumer(gamepad, state, events)" from the loop thread.
+    Exceptions raised by a consumer are reported and do not stop the loop.
+    A gamepad which loses its connection keeps its consumers and is serviced
+    again once it is reconnected, e.g. by its supervisor.
+    "events" is the list of events drained from the gamepad if events are
+    enabled on it, otherwise an empty list. Output reports queued on the
+    gamepads are written from the same loop."""
+
+    class loop_thread(threading.Thread):
+        """Thread running the I/O loop of a gamepad manager. One of these is
+        created by the manager start function and closed by stop."""
+
+        def __init__(self, manager):
+            threading.Thread.__init__(self)
+            self.manager = manager
+            self.daemon = True
+            self.running = True
+
+        def run(self):
+            try:
+                while self.running:
+                    self.manager.run_once()
+            finally:
+                self.running = False
+                self.manager = None
+
+    def __init__(self, timeout=0.1, poll_interval=0.001):
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._selector = selectors.DefaultSelector()
+        self._consumers = {}
+        self._polled = []
+        self._disconnected = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def gamepads(self):
+        return list(self._consumers)
+
+    def add(self, gamepad, consumer=None):
+        """Adds a connected gamepad to the manager, optionally with a consumer
+        of its state. Returns False if the gamepad is not connected."""
+
+        if not gamepad.is_connected:
+            return False
+        with self._lock:
+            if gamepad not in self._consumers:
+                self._consumers[gamepad] = []
+                self._register(gamepad)
+            if consumer is not None:
+                self._consumers[gamepad].append(consumer)
+        return True
+
+    def subscribe(self, gamepad, consumer):
+        """Adds a consumer of the state of a gamepad already added to the manager."""
+
+        with self._lock:
+            if gamepad not in self._consumers:
+                raise ValueError('Gamepad is not managed by this manager')
+            self._consumers[gamepad].append(consumer)
+
+    def remove(self, gamepad):
+        """Removes a gamepad and its consumers from the manager."""
+
+        with self._lock:
+            if self._consumers.pop(gamepad, None) is None:
+                return False
+            if gamepad in self._disconnected:
+                self._disconnected.remove(gamepad)
+            else:
+                self._unregister(gamepad)
+        return True
+
+    def _register(self, gamepad):
+        fileno = gamepad.device_fileno()
+        if fileno is not None:
+            self._selector.register(fileno, selectors.EVENT_READ, gamepad)
+        else:
+            self._polled.append(gamepad)
+
+    def _unregister(self, gamepad):
+        if gamepad in self._polled:
+            self._polled.remove(gamepad)
+        else:
+            for key in list(self._selector.get_map().values()):
+                if key.data is gamepad:
+                    self._selector.unregister(key.fileobj)
+
+    def _suspend(self, gamepad):
+        """Stops waiting on a disconnected gamepad, whose file descriptor is
+        stale, until it is connected again. Its consumers are kept."""
+
+        with self._lock:
+            if gamepad in self._consumers and gamepad not in self._disconnected:
+                self._unregister(gamepad)
+                self._disconnected.append(gamepad)
+
+    def start(self):
+        """Starts a background thread running the I/O loop."""
+
+        if self._thread is not None and self._thread.running:
+            raise RuntimeError('Gamepad manager is already running')
+        self._thread = gamepad_manager.loop_thread(self)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread. The thread stops after the current
+        iteration of the loop, at the latest after "timeout" seconds."""
+
+        if self._thread is not None:
+            self._thread.running = False
+            self._thread = None
+
+    def run_once(self):
+        """Waits for reports of the managed gamepads and processes them once.
+        Can be called directly instead of running the background thread."""
+
+        with self._lock:
+            # reconnected gamepads are registered with their new file descriptor
+            for gamepad in [gamepad for gamepad in self._disconnected if gamepad.is_connected]:
+                self._disconnected.remove(gamepad)
+                self._register(gamepad)
+            polled = list(self._polled)
+            gamepads = list(self._consumers)
+        timeout = self.poll_interval if polled else self.timeout
+        for gamepad in gamepads:
+            # queued output reports are written from the loop, wake up when the next is due
+            if gamepad.output_pending:
+                delay = gamepad.flush_output()
+                if delay is not None:
+                    timeout = min(timeout, delay)
+        ready = []
+        if self._selector.get_map():
+            ready = self._selector.select(timeout)
+        else:
+            time.sleep(timeout)
+        for key, mask in ready:
+            self._service(key.data)
+        for gamepad in polled:
+            self._service(gamepad)
+
+    def _service(self, gamepad):
+        changed = False
+        report = gamepad.read_raw_bits()
+        while report:
+            changed = gamepad.apply_report(report) or changed
+            report = gamepad.read_raw_bits()
+        if changed:
+            consumers = self._consumers.get(gamepad, ())
+            if consumers:
+                state = gamepad.get_state()
+                events = gamepad.get_events()
+                for consumer in consumers:
+                    # a failing consumer must not stop the loop of the other gamepads
+                    try:
+                        consumer(gamepad, state, events)
+                    except Exception as error:
+                        print(f'Gamepad consumer failed: {error!r}')
+        if not gamepad.is_connected:
+            self._suspend(gamepad)
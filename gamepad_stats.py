@@ -0,0 +1,101 @@
+class log2_histogram():
+    """Histogram of non-negative integer values (e.g. durations in nanoseconds)
+    with power of two buckets. Bucket "n" counts values from 2**(n-1) to
+    2**n - 1, so adding a value costs a few integer operations."""
+
+    def __init__(self, buckets=40):
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        index = value.bit_length()
+        if index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given fraction
+        of the values, or None if the histogram is empty."""
+
+        if self.count == 0:
+            return None
+        limit = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= limit:
+                return min((1 << index) - 1, self.max) if index else 0
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+            'buckets': {(1 << index) - 1 if index else 0: count
+                        for index, count in enumerate(self.counts) if count},
+        }
+
+
+class gamepad_statistics():
+    """Counters of a gamepad: reports read, decoded and unchanged, empty reads,
+    read errors and reconnects, the estimated report rate, and histograms of
+    the decode time and of the time from reading a report to publishing its
+    state, both in nanoseconds."""
+
+    # weight of the newest interval in the report rate estimate
+    RATE_SMOOTHING = 0.05
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.reports_read = 0
+        self.reports_decoded = 0
+        self.reports_unchanged = 0
+        self.empty_reads = 0
+        self.read_errors = 0
+        self.reconnects = 0
+        self.decode_time = log2_histogram()
+        self.publish_latency = log2_histogram()
+        self._last_report_time = None
+        self._report_interval = None
+
+    def report_read(self, timestamp):
+        self.reports_read += 1
+        if self._last_report_time is not None:
+            interval = timestamp - self._last_report_time
+            if self._report_interval is None:
+                self._report_interval = interval
+            else:
+                self._report_interval += (interval - self._report_interval) * self.RATE_SMOOTHING
+        self._last_report_time = timestamp
+
+    @property
+    def report_rate(self):
+        """Estimated number of reports per second, None before two reports were read."""
+
+        if not self._report_interval:
+            return None
+        return 1e9 / self._report_interval
+
+    def as_dict(self):
+        return {
+            'reports_read': self.reports_read,
+            'reports_decoded': self.reports_decoded,
+            'reports_unchanged': self.reports_unchanged,
+            'empty_reads': self.empty_reads,
+            'read_errors': self.read_errors,
+            'reconnects': self.reconnects,
+            'report_rate': self.report_rate,
+            'decode_time_ns': self.decode_time.as_dict(),
+            'publish_latency_ns': self.publish_latency.as_dict(),
+        }
@@ -0,0 +1,287 @@
+import os
+import select
+import time
+
+
+HIDRAW_CLASS_DIR = '/sys/class/hidraw'
+
+
+def _hidiocsfeature(length):
+    """Returns the HIDIOCSFEATURE ioctl request for a report of "length" bytes."""
+
+    return (3 << 30) | (length << 16) | (ord('H') << 8) | 0x06
+
+
+class hidapi_backend():
+    """Device backend using the hidapi "hid" package. This is the default
+    backend of hid_gamepad.
+
+    A backend provides "enumerate", which returns the list of dictionaries with
+    the data of available devices, and "open", which opens one of them and
+    returns a device object with hidapi-like "read(max_length, timeout_ms=0)",
+    "close" and optional "get_report_descriptor" methods. "open" raises OSError
+    when the device cannot be opened. The optional "identify(device)" returns
+    the identity fields a backend can read from an opened device, which are
+    checked when a device is reopened by a path another device may have taken."""
+
+    def enumerate(self):
+        import hid
+        return hid.enumerate()
+
+    def open(self, target_device):
+        import hid
+        device = hid.device()
+        if target_device.get('path'):
+            device.open_path(target_device['path'])
+        else:
+            device.open(target_device['vendor_id'], target_device['product_id'])
+        device.set_nonblocking(True)
+        if device.error() != "Success":
+            device.close()
+            raise OSError(f'Unable to open the device: {device.error()}')
+        return device
+
+    def identify(self, device):
+        # hidapi does not report the ids of an opened device, only its strings
+        return {'manufacturer_string': device.get_manufacturer_string(),
+                'product_string': device.get_product_string(),
+                'serial_number': device.get_serial_number_string()}
+
+
+class hidraw_device():
+    """Linux hidraw device read directly from its "/dev/hidrawN" node. Besides
+    the hidapi-like "read", it provides "readinto", which reads a report into
+    a caller provided buffer without allocating, and "fileno" for waiting on
+    the device with select or an event loop."""
+
+    def __init__(self, path):
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        self.path = path
+        try:
+            self._fd = os.open(path, os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+        except PermissionError:
+            self._fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK | os.O_CLOEXEC)
+        self._poll = select.poll()
+        self._poll.register(self._fd, select.POLLIN)
+
+    def fileno(self):
+        return self._fd
+
+    def readinto(self, buffer, timeout_ms=0):
+        """Reads one report into "buffer" and returns its length, or 0 if no
+        report arrived within "timeout_ms" milliseconds."""
+
+        if timeout_ms > 0 and not self._poll.poll(timeout_ms):
+            return 0
+        try:
+            return os.readv(self._fd, (buffer,))
+        except BlockingIOError:
+            return 0
+
+    def read(self, max_length, timeout_ms=0):
+        buffer = bytearray(max_length)
+        length = self.readinto(buffer, timeout_ms)
+        return bytes(buffer[:length])
+
+    def write(self, data):
+        return os.write(self._fd, bytes(data))
+
+    def send_feature_report(self, data):
+        import fcntl
+        buffer = bytearray(data)
+        return fcntl.ioctl(self._fd, _hidiocsfeature(len(buffer)), buffer)
+
+    def get_report_descriptor(self, max_length=4096):
+        name = os.path.basename(self.path)
+        with open(os.path.join(HIDRAW_CLASS_DIR, name, 'device', 'report_descriptor'), 'rb') as file:
+            return list(file.read(max_length))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class hidraw_backend():
+    """Pure Python device backend for Linux, opening "/dev/hidrawN" nodes
+    directly. It does not need the hid package and reads reports into
+    preallocated buffers. Device data is collected from sysfs."""
+
+    def enumerate(self):
+        try:
+            names = sorted(os.listdir(HIDRAW_CLASS_DIR))
+        except OSError:
+            return []
+        devices = []
+        for name in names:
+            try:
+                devices.append(_hidraw_device_info(name))
+            except (OSError, ValueError):
+                continue
+        return devices
+
+    def open(self, target_device):
+        return hidraw_device(target_device['path'])
+
+    def identify(self, device):
+        # the node stays bound to the opened device, so its sysfs data is current
+        return _hidraw_device_info(os.path.basename(device.path))
+
+
+class paced_device():
+    """Device delivering reports from an iterator of (timestamp, report) pairs,
+    with timestamps in nanoseconds. With "realtime" set, each report becomes
+    available when its time relative to the first report has elapsed, otherwise
+    reports are delivered as fast as they are read. Once the iterator is
+    exhausted reads return no data.
+
+    "due_time" is the monotonic time in nanoseconds at which the last returned
+    report became available, which benchmarks use to measure latency. Written
+    output and feature reports are collected with their monotonic times in
+    nanoseconds in "written" as (time, kind, report) tuples, kind being
+    "output" or "feature"."""
+
+    def __init__(self, reports, realtime=True, report_descriptor=None):
+        self._reports = iter(reports)
+        self._realtime = realtime
+        self._report_descriptor = report_descriptor
+        self._pending = None
+        self._start = None
+        self._first_timestamp = None
+        self.due_time = None
+        self.finished = False
+        self.written = []
+
+    def read(self, max_length, timeout_ms=0):
+        if self._pending is None:
+            self._pending = next(self._reports, None)
+            if self._pending is None:
+                self.finished = True
+                if timeout_ms > 0:
+                    time.sleep(timeout_ms / 1000)
+                return []
+
+        timestamp, report = self._pending
+        now = time.monotonic_ns()
+        due_time = now
+        if self._realtime:
+            if self._start is None:
+                self._start = now
+                self._first_timestamp = timestamp
+            due_time = self._start + (timestamp - self._first_timestamp)
+            delay = due_time - now
+            if delay > 0:
+                if delay > timeout_ms * 1000000:
+                    if timeout_ms > 0:
+                        time.sleep(timeout_ms / 1000)
+                    return []
+                time.sleep(delay / 1000000000)
+
+        self._pending = None
+        self.due_time = due_time
+        return bytes(report[:max_length])
+
+    def write(self, data):
+        self.written.append((time.monotonic_ns(), 'output', bytes(data)))
+        return len(data)
+
+    def send_feature_report(self, data):
+        self.written.append((time.monotonic_ns(), 'feature', bytes(data)))
+        return len(data)
+
+    def get_report_descriptor(self, max_length=4096):
+        if self._report_descriptor is None:
+            raise OSError('Report descriptor not available')
+        return list(self._report_descriptor[:max_length])
+
+    def close(self):
+        self._reports = iter(())
+        self._pending = None
+
+
+class synthetic_backend():
+    """Device backend generating reports from a Python iterable instead of a
+    physical device. Reports are delivered at "rate" reports per second, or as
+    fast as possible if "rate" is None. The "device_info" dictionary is the
+    only device returned by "enumerate"."""
+
+    def __init__(self, reports, rate=None, device_info=None, report_descriptor=None):
+        self._reports = reports
+        self._rate = rate
+        self._report_descriptor = report_descriptor
+        self.device_info = device_info if device_info is not None else {
+            'vendor_id': 0, 'product_id': 0, 'path': b'synthetic',
+            'serial_number': '', 'manufacturer_string': 'synthetic',
+            'product_string': 'Synthetic Joystick'}
+
+    def enumerate(self):
+        return [self.device_info]
+
+    def open(self, target_device):
+        if self._rate is None:
+            reports = ((0, report) for report in self._reports)
+        else:
+            period = 1000000000 / self._rate
+            reports = ((int(index * period), report) for index, report in enumerate(self._reports))
+        return paced_device(reports, self._rate is not None, self._report_descriptor)
+
+
+def _hidraw_device_info(name):
+    """Returns a hidapi-like dictionary with the data of a hidraw device."""
+
+    device_dir = os.path.realpath(os.path.join(HIDRAW_CLASS_DIR, name, 'device'))
+    uevent = {}
+    with open(os.path.join(device_dir, 'uevent')) as file:
+        for line in file:
+            key, _, value = line.strip().partition('=')
+            uevent[key] = value
+    bus, vendor_id, product_id = uevent['HID_ID'].split(':')
+    with open(os.path.join(device_dir, 'report_descriptor'), 'rb') as file:
+        usage_page, usage = _top_level_usage(file.read())
+
+    interface_dir = os.path.dirname(device_dir)
+    usb_dir = os.path.dirname(interface_dir)
+    interface_number = -1
+    if ':' in os.path.basename(interface_dir):
+        interface_number = int(os.path.basename(interface_dir).rpartition('.')[2])
+
+    return {
+        'path': os.fsencode(os.path.join('/dev', name)),
+        'vendor_id': int(vendor_id, 16),
+        'product_id': int(product_id, 16),
+        'serial_number': _read_sysfs(usb_dir, 'serial') or uevent.get('HID_UNIQ', ''),
+        'release_number': 0,
+        'manufacturer_string': _read_sysfs(usb_dir, 'manufacturer'),
+        'product_string': _read_sysfs(usb_dir, 'product') or uevent.get('HID_NAME', ''),
+        'usage_page': usage_page,
+        'usage': usage,
+        'interface_number': interface_number,
+    }
+
+
+def _read_sysfs(directory, attribute):
+    try:
+        with open(os.path.join(directory, attribute)) as file:
+            return file.read().strip()
+    except OSError:
+        return ''
+
+
+def _top_level_usage(descriptor):
+    """Returns the usage page and usage of the first top level collection."""
+
+    usage_page = usage = 0
+    position = 0
+    while position < len(descriptor):
+        prefix = descriptor[position]
+        size = (0, 1, 2, 4)[prefix & 0x03]
+        value = int.from_bytes(descriptor[position + 1:position + 1 + size], 'little')
+        if prefix & 0xFC == 0x04:
+            usage_page = value
+        elif prefix & 0xFC == 0x08:
+            usage = value
+        elif prefix & 0xFC == 0xA0:
+            break
+        position += 1 + size
+    return usage_page, usage
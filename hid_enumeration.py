@@ -0,0 +1,168 @@
+import os
+import threading
+
+from hid_backends import hidapi_backend
+
+
+DEVICE_ADDED = 'device_added'
+DEVICE_REMOVED = 'device_removed'
+
+USAGE_PAGE_GENERIC_DESKTOP = 0x01
+GAMEPAD_USAGES = (0x04, 0x05, 0x08)  # joystick, gamepad, multi-axis controller
+
+HIDRAW_CLASS_DIR = '/sys/class/hidraw'
+
+
+def is_gamepad(device):
+    """Returns True for devices whose top level usage is a joystick, gamepad
+    or multi-axis controller. Backends which do not report usages (usage page 0)
+    fall back to the "Joystick" product string heuristic."""
+
+    if device.get('usage_page'):
+        return device['usage_page'] == USAGE_PAGE_GENERIC_DESKTOP and device.get('usage') in GAMEPAD_USAGES
+    return 'Joystick' in (device.get('product_string') or '')
+
+
+def device_key(device):
+    """Returns the key identifying a device interface in enumeration results."""
+
+    return device.get('path') or (device.get('vendor_id'), device.get('product_id'),
+                                  device.get('serial_number'), device.get('interface_number'))
+
+
+class device_cache():
+    """Cache of enumerated HID devices indexed by vendor/product id, path and
+    serial number. "refresh" enumerates the devices again and reports only the
+    differences to the listeners, as DEVICE_ADDED and DEVICE_REMOVED calls of
+    "listener(kind, device)".
+
+    "start_watching" starts a background thread watching for hotplug events.
+    On Linux it lists the hidraw nodes, which is cheap, and enumerates the
+    devices only when the nodes change. On other systems it refreshes the
+    cache every "interval" seconds."""
+
+    class watch_thread(threading.Thread):
+        """Thread refreshing a device cache on hotplug events. One of these is
+        created by the cache start_watching function and closed by stop_watching."""
+
+        def __init__(self, cache, interval):
+            threading.Thread.__init__(self)
+            self.cache = cache
+            self.interval = interval
+            self.daemon = True
+            self.running = True
+            self._stop_event = threading.Event()
+
+        def stop(self):
+            self.running = False
+            self._stop_event.set()
+
+        def run(self):
+            nodes = _hidraw_nodes()
+            while self.running:
+                if self._stop_event.wait(self.interval):
+                    break
+                current = _hidraw_nodes()
+                if current is None or current != nodes:
+                    nodes = current
+                    self.cache.refresh()
+            self.cache = None
+
+    def __init__(self, backend=None, predicate=None):
+        self._backend = backend if backend is not None else hidapi_backend()
+        self._predicate = predicate
+        self._devices = {}
+        self._by_ids = {}
+        self._by_serial = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._watch_thread = None
+        self._refreshed = False
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def refresh(self):
+        """Enumerates the devices and updates the cache. Returns the lists of
+        added and removed devices."""
+
+        devices = {}
+        for device in self._backend.enumerate():
+            if self._predicate is None or self._predicate(device):
+                devices.setdefault(device_key(device), device)
+
+        with self._lock:
+            added = [device for key, device in devices.items() if key not in self._devices]
+            removed = [device for key, device in self._devices.items() if key not in devices]
+            self._devices = devices
+            self._by_ids = {}
+            self._by_serial = {}
+            for device in devices.values():
+                self._by_ids.setdefault((device.get('vendor_id'), device.get('product_id')), []).append(device)
+                if device.get('serial_number'):
+                    self._by_serial.setdefault(device['serial_number'], []).append(device)
+            self._refreshed = True
+
+        for device in removed:
+            self._notify(DEVICE_REMOVED, device)
+        for device in added:
+            self._notify(DEVICE_ADDED, device)
+        return added, removed
+
+    def devices(self, predicate=None):
+        """Returns the cached devices, optionally filtered with "predicate".
+        The cache is filled on the first call."""
+
+        self._ensure_refreshed()
+        with self._lock:
+            devices = list(self._devices.values())
+        if predicate is not None:
+            devices = [device for device in devices if predicate(device)]
+        return devices
+
+    def find_by_path(self, path):
+        self._ensure_refreshed()
+        return self._devices.get(path)
+
+    def find_by_ids(self, vendor_id, product_id):
+        self._ensure_refreshed()
+        return list(self._by_ids.get((vendor_id, product_id), ()))
+
+    def find_by_serial(self, serial_number):
+        self._ensure_refreshed()
+        return list(self._by_serial.get(serial_number, ()))
+
+    def start_watching(self, interval=0.5):
+        """Starts a background thread refreshing the cache on hotplug events."""
+
+        if self._watch_thread is not None and self._watch_thread.running:
+            raise RuntimeError('Device cache is already watching for hotplug events')
+        self._ensure_refreshed()
+        self._watch_thread = device_cache.watch_thread(self, interval)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        if self._watch_thread is not None:
+            self._watch_thread.stop()
+            self._watch_thread = None
+
+    def _ensure_refreshed(self):
+        if not self._refreshed:
+            self.refresh()
+
+    def _notify(self, kind, device):
+        for listener in list(self._listeners):
+            listener(kind, device)
+
+
+def _hidraw_nodes():
+    """Returns the set of hidraw device names, or None where hidraw is not available."""
+
+    try:
+        return frozenset(os.listdir(HIDRAW_CLASS_DIR))
+    except OSError:
+        return None
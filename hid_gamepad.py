@@ -1,45 +1,94 @@
-import hid
 import time
 import threading
+from collections import deque, namedtuple
 
+from event_dispatcher import event_dispatcher
+from gamepad_events import gamepad_event, gamepad_frame, gamepad_state, gamepad_tick, BUTTON_DOWN, BUTTON_UP, AXIS_MOVED, COMBO
+from axis_conditioning import compile_filter, condition_layout
+from button_combos import combo_engine
+from hid_backends import hidapi_backend
+from hid_enumeration import device_key
+from hid_recording import report_recorder
+from output_queue import output_queue
+from shared_state import shared_state_publisher
+from state_streaming import state_publisher
+from gamepad_stats import gamepad_statistics
+from report_descriptor import parse_report_descriptor
+from report_history import report_history
 
-def list_gamepads():
+
+# device fields compared to check that a reopened device is the connected one
+IDENTITY_FIELDS = ('vendor_id', 'product_id', 'serial_number', 'manufacturer_string', 'product_string')
+
+
+def list_gamepads(predicate=None, backend=None):
     """List devices that fit in the category "joystick". Returns list of
-    dictionaries with device data for each identified device."""
+    dictionaries with device data for each identified device. A custom
+    "predicate" taking the device dictionary can be used instead of the
+    "Joystick" product string match. For repeated discovery use the
+    "hid_enumeration.device_cache", which enumerates only on hotplug events."""
+
+    if predicate is None:
+        predicate = lambda device: "Joystick" in (device['product_string'] or '')
+    if backend is None:
+        backend = hidapi_backend()
 
-    device_list = []
-    for device in hid.enumerate():
-        if "Joystick" in device['product_string']:
-            if device not in device_list:
-                device_list.append(device)
-    return device_list
+    devices = {}
+    for device in backend.enumerate():
+        if predicate(device):
+            devices.setdefault(device_key(device), device)
+    return list(devices.values())
 
 
 class hid_gamepad():
 
+    PROCESS_ALL = 'all'
+    PROCESS_LATEST = 'latest'
+
     class MappingException(Exception):
         "Raised when the controller mapping is not provided"
         pass
 
     class update_thread(threading.Thread):
-        """Thread used to continually run the updateState function on a Gamepad
-        in the background. One of these is created by the Gamepad start_asynchronous 
-        function and closed by stop_asynchronous"""
+        """Thread used to continually read the reports of a Gamepad in the background.
+        One of these is created by the Gamepad start_asynchronous function and closed
+        by stop_asynchronous.
+
+        The thread blocks on the device for at most "timeout" seconds and wakes up as
+        soon as a report arrives. Every report pending in the device buffer is then
+        drained. With the PROCESS_ALL policy each drained report is processed in
+        order, with PROCESS_LATEST only the newest one is processed."""
 
-        def __init__(self, gamepad):
+        def __init__(self, gamepad, policy=None, timeout=0.1):
             threading.Thread.__init__(self)
             if isinstance(gamepad, hid_gamepad):
                 self.gamepad = gamepad
             else:
                 raise ValueError('Gamepad update thread was not created with a valid Gamepad object')
+            if policy is None:
+                policy = hid_gamepad.PROCESS_ALL
+            if policy not in (hid_gamepad.PROCESS_ALL, hid_gamepad.PROCESS_LATEST):
+                raise ValueError(f'Unknown report processing policy {policy}')
+            self.policy = policy
+            self.timeout = timeout
+            self.daemon = True
             self.running = True
             print("thread created")
 
         def run(self):
             try:
+                timeout_ms = max(1, int(self.timeout * 1000))
                 while self.running:
-                    time.sleep(100/1000)
-                    self.gamepad.update_state()
+                    if not self.gamepad.wait_connected(self.timeout):
+                        continue
+                    report = self.gamepad.read_raw_bits(timeout_ms)
+                    timestamp = time.monotonic_ns()
+                    while report:
+                        pending = self.gamepad.read_raw_bits()
+                        pending_timestamp = time.monotonic_ns()
+                        if self.policy == hid_gamepad.PROCESS_ALL or not pending:
+                            self.gamepad.apply_report(report, timestamp)
+                        report, timestamp = pending, pending_timestamp
                 self.gamepad = None
             except:
                 self.running = False
@@ -47,22 +96,117 @@ class hid_gamepad():
                 raise
 
 
-    def __init__(self):
+    class reconnect_thread(threading.Thread):
+        """Thread supervising the connection of a Gamepad. When the connection is
+        lost the thread reconnects the device with an exponential backoff: the first
+        attempt is made after "initial_delay" seconds and each failed attempt
+        multiplies the delay by "factor", up to "max_delay". One of these is created
+        by the Gamepad start_supervisor function and closed by stop_supervisor."""
+
+        def __init__(self, gamepad, initial_delay=0.001, max_delay=2.0, factor=2.0):
+            threading.Thread.__init__(self)
+            if isinstance(gamepad, hid_gamepad):
+                self.gamepad = gamepad
+            else:
+                raise ValueError('Gamepad reconnect thread was not created with a valid Gamepad object')
+            self.initial_delay = initial_delay
+            self.max_delay = max_delay
+            self.factor = factor
+            self.daemon = True
+            self.running = True
+            self._stop_event = threading.Event()
+
+        def stop(self):
+            self.running = False
+            self._stop_event.set()
+            gamepad = self.gamepad
+            if gamepad is not None:
+                with gamepad._connection_changed:
+                    gamepad._connection_changed.notify_all()
+
+        def run(self):
+            try:
+                while self.running:
+                    with self.gamepad._connection_changed:
+                        self.gamepad._connection_changed.wait_for(
+                            lambda: not self.running or not self.gamepad.is_connected)
+                    delay = self.initial_delay
+                    while self.running and not self.gamepad.is_connected:
+                        if self._stop_event.wait(delay):
+                            break
+                        if self.gamepad.reconnect():
+                            break
+                        delay = min(delay * self.factor, self.max_delay)
+                self.gamepad = None
+            except:
+                self.running = False
+                self.gamepad = None
+                raise
+
+
+    def __init__(self, backend=None):
+        self._backend = backend if backend is not None else hidapi_backend()
         self.__device_instance = None
         self.__MAX_BYTES = 128
+        self.__readinto = None
+        self.__buffers = ()
+        self.__views = ()
+        self.__buffer_index = 0
+        self.__last_report = None
+        self.__last_report_time = 0
         self._device_info = {}
         self._is_connected = False
+        self._report_descriptor = None
 
         self._raw_inputs = []
         self._button_mapping = {}
-        self._button_sate = []
+        self._button_state = []
+        self._button_mask = 0
         self._axis_mapping = {}
-        self._axis_sate = []
+        self._axis_state = []
+        self._axis_names = []
+        self._button_names = []
+        self._state = gamepad_state(0, 0, b'', (), ())
+        self._axes_record = None
+        self._buttons_record = None
+        self._frame_cache = (None, None)
+        self._events = None
+        self._events_dropped = 0
+        self._tick_states = None
+        self._tick_base = None
+        self._tick_time = 0
+        self._ticks_dropped = 0
+        self._event_axes = []
+        self._axis_threshold = 0.0
+        self._dispatcher = None
+        self._combos = None
+        self._output = output_queue()
+        self._stats = gamepad_statistics()
+        self._profiler = None
+        self._report_layout = None
+        self._decode_layout = None
+        self._axis_conditioning = {}
+        self._stick_deadzones = {}
+        self._axis_filter = None
+        self._axis_settling = False
+        self._decoder_changed = False
+        self._decoder = None
+        self._array_decoder = None
+        self._history = None
+        self._recorder = None
+        self._publisher = None
+        self._streamer = None
         self._update_thread = None
+        self._reconnect_thread = None
+        self._auto_layout = False
         self._lock = threading.Lock()
+        self._connection_changed = threading.Condition()
 
     def __del__(self):
         self.disconnect()
+        self.stop_sharing()
+        if self._dispatcher is not None:
+            self._dispatcher.stop()
 
 
     @property
@@ -102,6 +246,14 @@ class hid_gamepad():
             raise ValueError(f'Property {field} was not found')
     
 
+    @property
+    def report_descriptor(self):
+        """Returns the parsed HID report descriptor of the connected device or
+        None if the device did not provide it."""
+
+        return self._report_descriptor
+
+
     @property
     def raw_inputs(self):
         """ Returnslist of bytes that represent the state of the controller."""
@@ -109,72 +261,221 @@ class hid_gamepad():
         return self._raw_inputs
     
 
-    def connect(self, target_device):
+    def connect(self, target_device, backend=None):
         """Connects with device specified by "target_device" variable. The "target_device"
         is a dictionary containig "ventor_id" and "product_it" keys with assiciated values.
         List of dictionaries with available devides is provided by "list_devices" helper 
         function. The "connect" method returns True if connected with the gamepad, otherwise
-        it returns False."""
+        it returns False.
+
+        The device is opened with the "backend" if provided, otherwise with the backend
+        of the gamepad (hidapi by default). Replay files and synthetic devices are opened
+        this way, see "hid_recording.replay_backend" and "hid_backends.synthetic_backend".
 
+        On connection the report descriptor of the device is read to find the length
+        of its input reports. If no axis or button mapping was provided, the mapping
+        and the decoder are built from the descriptor."""
+
+        if backend is not None:
+            self._backend = backend
         try:
-            self.__device_instance = hid.device()
-            self.__device_instance.open(target_device['vendor_id'], target_device['product_id'])
-            self.__device_instance.set_nonblocking(True)
-            if (self.__device_instance.error() == "Success"):
-                self._device_info = target_device
-                self._is_connected = True
-                print('Connection with the device e has been stablished')
-                return True
-            else:
-                self._is_connected = False
-                print('Unable to connect with the selected device')
-                return False
+            self.__device_instance = self._backend.open(target_device)
+            self._device_info = target_device
+            self._start_dispatcher()
+            self._set_connected(True)
+            self._read_report_descriptor()
+            self._allocate_buffers()
+            print('Connection with the device e has been stablished')
+            return True
         except OSError:
-            self._is_connected = False
+            self._set_connected(False)
             print('Unable to connect with the selected device')
             return False
 
 
-    def reconnect(self):
-        """Reconnects previosly connected device."""
+    def _allocate_buffers(self):
+        """Prepares the read buffers of devices supporting "readinto"."""
+
+        self.__readinto = getattr(self.__device_instance, 'readinto', None)
+        if self.__readinto is None:
+            return
+        if not self.__buffers or len(self.__buffers[0]) != self.__MAX_BYTES:
+            self.__buffers = (bytearray(self.__MAX_BYTES), bytearray(self.__MAX_BYTES))
+            self.__views = tuple(memoryview(buffer) for buffer in self.__buffers)
+
+
+    def _set_connected(self, connected):
+        with self._connection_changed:
+            self._is_connected = connected
+            self._connection_changed.notify_all()
+
+
+    def wait_connected(self, timeout=None):
+        """Waits at most "timeout" seconds until the gamepad is connected.
+        Returns True if the gamepad is connected."""
+
+        with self._connection_changed:
+            return self._connection_changed.wait_for(lambda: self._is_connected, timeout)
+
+
+    def device_fileno(self):
+        """Returns the file descriptor of the connected device, which can be
+        waited on with select or an event loop, or None if the backend does
+        not provide one."""
+
+        if self._is_connected and hasattr(self.__device_instance, 'fileno'):
+            return self.__device_instance.fileno()
+        return None
+
+
+    def _read_report_descriptor(self):
+        """Reads and parses the report descriptor of the connected device."""
 
         try:
-            self.__device_instance = hid.device()
-            self.__device_instance.open(self._vendor_id, self._product_id)
-            self.__device_instance.set_nonblocking(True)
-            if (self.__device_instance.error() == "Success"):
-                self._is_connected = True
-                print('Connection with the device has been reestablished')
-                return True
-            else:
-                self._is_connected = False
-                print('Unable to reconnect with the device')
-                return False
-        except OSError:
+            descriptor = parse_report_descriptor(self.__device_instance.get_report_descriptor())
+        except (AttributeError, OSError, ValueError):
+            print('Report descriptor not avialable')
+            return False
+
+        self._report_descriptor = descriptor
+        if descriptor.input_report_length > 0:
+            self.__MAX_BYTES = descriptor.input_report_length
+        if self._auto_layout or (not self._axis_mapping and not self._button_mapping):
+            layout = descriptor.build_layout()
+            if layout is not None:
+                self.set_report_layout(layout)
+                self._auto_layout = True
+        return True
+
+
+    def reconnect(self):
+        """Reconnects previosly connected device. Mappings, decoder and state of
+        the gamepad are kept.
+
+        The device is reopened by its path, and the identity of the opened
+        device (vendor id, product id, serial number and strings, as far as the
+        backend reports them, see "hidapi_backend") is checked against the
+        connected one, since paths such as "/dev/hidrawN" are reused by other
+        devices after a replug. Only when that fails the devices are enumerated
+        to find the same vendor id, product id, serial number and interface at
+        a new path; devices with an empty serial number cannot be told apart
+        from identical pads and are not looked up. A device connected by its
+        vendor and product id only is reopened the same way."""
+
+        if not self._device_info:
+            print('Unable to reconnect - no device was connected')
+            return False
+        if self.__device_instance is not None:
+            try:
+                self.__device_instance.close()
+            except OSError:
+                pass
+            self.__device_instance = None
+
+        device = self._reopen_device()
+        if device is None:
             print('Unable to reconnect with the device')
             return False
+        self.__device_instance = device
+
+        self._allocate_buffers()
+        self._stats.reconnects += 1
+        self._start_dispatcher()
+        self._set_connected(True)
+        print('Connection with the device has been reestablished')
+        return True
+
+
+    def _reopen_device(self):
+        """Opens the previously connected device, see "reconnect". Returns the
+        opened device or None."""
+
+        info = self._device_info
+        if not info.get('path'):
+            try:
+                return self._backend.open(info)
+            except (OSError, KeyError):
+                return None
+        device = self._open_same_device(info)
+        if device is not None or not info.get('serial_number'):
+            return device
+        try:
+            devices = self._backend.enumerate()
+        except OSError:
+            return None
+        for candidate in devices:
+            if (candidate.get('path') != info['path']
+                    and candidate.get('interface_number') == info.get('interface_number')
+                    and self._is_same_device(candidate)):
+                device = self._open_same_device(candidate)
+                if device is not None:
+                    self._device_info = candidate
+                    return device
+        return None
+
+
+    def _open_same_device(self, target_device):
+        """Opens "target_device" and returns it if the backend identifies it as
+        the connected device, otherwise closes it and returns None."""
+
+        try:
+            device = self._backend.open(target_device)
+        except (OSError, KeyError):
+            return None
+        identify = getattr(self._backend, 'identify', None)
+        if identify is None:
+            return device
+        try:
+            same = self._is_same_device(identify(device))
+        except (OSError, ValueError, KeyError):
+            same = False
+        if not same:
+            try:
+                device.close()
+            except OSError:
+                pass
+            return None
+        return device
+
+
+    def _is_same_device(self, identity):
+        """Returns True if the "identity" dictionary of a device matches the
+        connected device in every identity field known for both."""
+
+        for key in IDENTITY_FIELDS:
+            expected = self._device_info.get(key)
+            if expected in (None, '') or key not in identity:
+                continue
+            if identity[key] != expected:
+                return False
+        return True
 
 
     def disconnect(self):
-        """Disconnects with the controller"""
+        """Disconnects with the controller. The device info, mappings and state
+        are kept, so the same device can be connected again with "reconnect"."""
 
+        self.stop_supervisor()
         try:
             if self._is_connected is True:
                 if self.__device_instance is not None:
-                    self.__device_instance.close()
-                    self.__device_instance = None
-                    self.__MAX_BYTES = 128
-                    self._device_info = {}
-                    self._is_connected = False
-
-                    self._raw_inputs = []
-                    self._button_mapping = {}
-                    self._button_sate = []
-                    self._axis_mapping = {}
-                    self._axis_sate = []
+                    # the update thread blocks in a read of the device, which
+                    # must end before the device handle is closed
+                    thread = self._update_thread
                     self.stop_asynchronous()
+                    if thread is not None and thread is not threading.current_thread():
+                        thread.join()
                     self._update_thread = None
-                    
+                    self.__device_instance.close()
+                    self.__device_instance = None
+                    self._set_connected(False)
+                    self.stop_recording()
+                    self._output.clear()
+                    self.stop_sharing()
+                    self.stop_streaming()
+                    if self._dispatcher is not None:
+                        self._dispatcher.stop()
+
                     print('Device disconnected')
                     return True
             return False
@@ -183,17 +484,96 @@ class hid_gamepad():
             return False
 
 
-    def read_raw_bits(self):
+    def read_raw_bits(self, timeout_ms=0):
         """Function reads the controller state as raw bits and returns
-        them as list of bytes that represent the state of the controller."""
+        them as list of bytes that represent the state of the controller.
+        With "timeout_ms" greater than zero the call blocks until a report
+        arrives or the timeout expires.
+
+        Devices supporting "readinto" read into one of two preallocated buffers
+        sized to the input report length, used in turns, and the report is
+        returned as a memoryview of that buffer. It stays valid until the second
+        next read."""
 
         if self._is_connected is True:
+            if self._output:
+                delay = self.flush_output()
+                if delay is not None and timeout_ms > 0:
+                    timeout_ms = min(timeout_ms, max(1, int(delay * 1000)))
+            profiler = self._profiler
+            if profiler is not None:
+                start = time.perf_counter_ns()
             try:
-                return self.__device_instance.read(self.__MAX_BYTES)
+                if self.__readinto is not None:
+                    self.__buffer_index ^= 1
+                    length = self.__readinto(self.__buffers[self.__buffer_index], timeout_ms)
+                    report = self.__views[self.__buffer_index][:length] if length else []
+                elif timeout_ms > 0:
+                    report = self.__device_instance.read(self.__MAX_BYTES, timeout_ms)
+                else:
+                    report = self.__device_instance.read(self.__MAX_BYTES)
             except IOError:
                 print("Device connection lost")
-                self._is_connected = False
+                self._stats.read_errors += 1
+                self._set_connected(False)
                 return None
+            if profiler is not None:
+                profiler('read', time.perf_counter_ns() - start)
+            if report:
+                self.__last_report = report
+                self.__last_report_time = time.monotonic_ns()
+                self._stats.report_read(self.__last_report_time)
+            else:
+                self._stats.empty_reads += 1
+            return report
+
+
+    def write_output(self, report):
+        """Queues an output report (e.g. rumble or LEDs) for the device. The
+        first byte is the report id (0 for devices without report ids). A
+        queued report replaces a pending report with the same id, and reports
+        are written at most once every "set_output_interval" seconds by the
+        loop reading the device (the update thread, "update_state", the
+        gamepad manager or "async_gamepad"), so writes never delay input
+        processing. Returns True if the report was queued."""
+
+        if not self._is_connected:
+            print('Unable to write - gamepad is not connected')
+            return False
+        self._output.put(report)
+        return True
+
+
+    def send_feature_report(self, report):
+        """Queues a feature report for the device, see "write_output"."""
+
+        if not self._is_connected:
+            print('Unable to write - gamepad is not connected')
+            return False
+        self._output.put(report, feature=True)
+        return True
+
+
+    def set_output_interval(self, min_interval):
+        """Sets the minimal time in seconds between two reports written to the device."""
+
+        self._output.min_interval = min_interval
+
+
+    @property
+    def output_pending(self):
+        return len(self._output)
+
+
+    def flush_output(self):
+        """Writes the next queued output report if the rate limit allows it.
+        Returns the number of seconds until the next write is due, or None if
+        no report is pending. Called by the loops reading the device."""
+
+        device = self.__device_instance
+        if device is None:
+            return None
+        return self._output.flush(device)
 
 
     def update_state(self):
@@ -204,35 +584,372 @@ class hid_gamepad():
         state of the controller. Raw bits are storred in "raw_inputs" variable."""
 
         if self._is_connected is True:
-            self._lock.acquire()
-            self._raw_inputs = self.read_raw_bits()
-            if self._raw_inputs:
-                self._lock.release()
-                self.process_inputs()
+            raw_inputs = self.read_raw_bits()
+            if raw_inputs:
+                self.apply_report(raw_inputs)
                 return True
             else:
-                self._lock.release()
                 return False
         else:
-            self._lock.release()
             return False
 
 
+    def apply_report(self, raw_inputs, timestamp=None):
+        """Stores a report read from the device in the "raw_inputs" variable,
+        interprets it with "process_inputs" and publishes the new state snapshot.
+        Returns False without decoding if the report is identical to the previous
+        one, otherwise returns True.
+
+        "process_inputs" writes to the working axis and button lists, which are
+        only copied into an immutable snapshot once the whole report has been
+        processed. Consumers always see either the previous or the new frame.
+
+        A report given as a memoryview of the read buffer is compared and decoded
+        in place, it is only copied into the snapshot when it has changed."""
+
+        if timestamp is None:
+            if raw_inputs is self.__last_report:
+                timestamp = self.__last_report_time
+            else:
+                timestamp = time.monotonic_ns()
+        if not isinstance(raw_inputs, (bytes, memoryview)):
+            raw_inputs = bytes(raw_inputs)
+        stats = self._stats
+        with self._lock:
+            # the disable functions may run on other threads, read each feature once
+            history = self._history
+            tick_states = self._tick_states
+            event_queue = self._events
+            if history is not None:
+                history.append(raw_inputs, timestamp)
+            if self._recorder is not None:
+                self._recorder.write(raw_inputs, timestamp)
+            previous = self._state
+            if (raw_inputs == previous.raw_inputs and not self._axis_settling
+                    and not self._decoder_changed):
+                stats.reports_unchanged += 1
+                return False
+            self._decoder_changed = False
+            self._raw_inputs = raw_inputs
+            start = time.perf_counter_ns()
+            self.process_inputs()
+            decode_time = time.perf_counter_ns() - start
+            if self._decoder is None:
+                self._button_mask = _button_mask(self._button_state)
+            self._state = gamepad_state(previous.sequence + 1, timestamp, bytes(raw_inputs),
+                                        tuple(self._axis_state), tuple(self._button_state),
+                                        self._button_mask)
+            self._raw_inputs = self._state.raw_inputs
+            if self._publisher is not None:
+                self._publisher.publish(self._state)
+            if self._streamer is not None:
+                self._streamer.publish(self._state)
+            if tick_states is not None:
+                if len(tick_states) == tick_states.maxlen:
+                    self._ticks_dropped += 1
+                tick_states.append(self._state)
+            stats.reports_decoded += 1
+            stats.decode_time.add(decode_time)
+            stats.publish_latency.add(max(0, time.monotonic_ns() - timestamp))
+            if self._profiler is not None:
+                self._profiler('process', decode_time)
+            combos = ()
+            if self._combos is not None:
+                combos = self._combos.update(self._button_mask, timestamp)
+            events = None
+            if event_queue is not None or self._dispatcher is not None:
+                events = self._emit_events(previous, self._state, combos, event_queue)
+        if events and self._dispatcher is not None:
+            self._dispatcher.post(events)
+        return True
+
+
+    def _emit_events(self, previous, state, combos=(), event_queue=None):
+        """Appends the button edges and axis moves between two snapshots, and
+        the detected combos, to "event_queue" if given and returns them."""
+
+        events = []
+        changed = previous.button_mask ^ state.button_mask
+        if changed and len(previous.buttons) == len(state.buttons):
+            while changed:
+                index = (changed & -changed).bit_length() - 1
+                changed &= changed - 1
+                pressed = state.buttons[index]
+                events.append(gamepad_event(state.timestamp, state.sequence,
+                                            BUTTON_DOWN if pressed else BUTTON_UP,
+                                            self._button_names[index], pressed))
+        if len(self._event_axes) == len(state.axes):
+            for index, value in enumerate(state.axes):
+                if abs(value - self._event_axes[index]) > self._axis_threshold:
+                    self._event_axes[index] = value
+                    events.append(gamepad_event(state.timestamp, state.sequence, AXIS_MOVED,
+                                                self._axis_names[index], value))
+        for name in combos:
+            events.append(gamepad_event(state.timestamp, state.sequence, COMBO, name, True))
+        if event_queue is not None:
+            for event in events:
+                if len(event_queue) == event_queue.maxlen:
+                    self._events_dropped += 1
+                event_queue.append(event)
+        return events
+
+
+    def enable_events(self, max_events=256, axis_threshold=0.01):
+        """Starts recording button press/release and axis move events of every
+        changed report in a queue of at most "max_events" events. When the queue
+        is full the oldest events are dropped. An axis move is reported when the
+        axis has moved by more than "axis_threshold" since its last reported value."""
+
+        with self._lock:
+            self._event_axes = list(self._state.axes)
+            self._axis_threshold = axis_threshold
+            self._events_dropped = 0
+            self._events = deque(maxlen=max_events)
+
+
+    def disable_events(self):
+        """Stops recording events and discards the events not read yet."""
+
+        with self._lock:
+            self._events = None
+
+
+    def get_events(self, max_events=None):
+        """Returns the list of recorded events, oldest first, and removes them
+        from the queue. At most "max_events" events are returned if provided."""
+
+        events = []
+        queue = self._events
+        if queue is None:
+            return events
+        while queue and (max_events is None or len(events) < max_events):
+            events.append(queue.popleft())
+        return events
+
+
+    def enable_ticks(self, capacity=1024):
+        """Starts keeping the state snapshots published since the last
+        "get_tick" call, at most "capacity" of them, which must cover the
+        reports of one tick period."""
+
+        with self._lock:
+            self._tick_states = deque(maxlen=capacity)
+            self._tick_base = self._state
+            self._tick_time = self._state.timestamp
+            self._ticks_dropped = 0
+
+
+    def disable_ticks(self):
+        with self._lock:
+            self._tick_states = None
+            self._tick_base = None
+
+
+    def get_tick(self, timestamp=None):
+        """Returns a "gamepad_tick" for a fixed rate loop: the newest state at or
+        before the monotonic "timestamp" in nanoseconds (now by default), and
+        the button transitions of the states between the previous call and
+        "timestamp", so short taps between two ticks are never lost. States
+        newer than "timestamp" are kept for the next tick. Requires
+        "enable_ticks" and timestamps which never go backwards.
+
+        Everything is served from the snapshots published by the reader,
+        without reading the device."""
+
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+
+        with self._lock:
+            states = self._tick_states
+            if states is None:
+                raise RuntimeError('Ticks are not enabled')
+            if timestamp < self._tick_time:
+                raise ValueError('Tick timestamp is older than the previous tick')
+            state = self._tick_base
+            consumed = []
+            while states and states[0].timestamp <= timestamp:
+                consumed.append(states.popleft())
+            dropped = self._ticks_dropped
+            self._ticks_dropped = 0
+
+        pressed = released = 0
+        transitions = []
+        for current in consumed:
+            changed = state.button_mask ^ current.button_mask
+            if changed and len(state.buttons) == len(current.buttons):
+                pressed |= changed & current.button_mask
+                released |= changed & state.button_mask
+                while changed:
+                    index = (changed & -changed).bit_length() - 1
+                    changed &= changed - 1
+                    down = current.buttons[index]
+                    transitions.append(gamepad_event(current.timestamp, current.sequence,
+                                                     BUTTON_DOWN if down else BUTTON_UP,
+                                                     self._button_names[index], down))
+            state = current
+        self._tick_base = state
+        self._tick_time = timestamp
+        return gamepad_tick(timestamp, state, pressed, released, tuple(transitions), dropped)
+
+
+    def get_stats(self):
+        """Returns a dictionary with the counters of the gamepad: reports read,
+        decoded and unchanged, empty reads, read errors, reconnects, estimated
+        report rate, histograms of the decode time and of the time from reading
+        a report to publishing its state (in nanoseconds), and the depths of the
+        event queues."""
+
+        stats = self._stats.as_dict()
+        event_queue = self._events
+        stats['event_queue_depth'] = len(event_queue) if event_queue is not None else 0
+        stats['events_dropped'] = self._events_dropped
+        if self._dispatcher is not None:
+            stats['dispatcher_queue_depth'] = self._dispatcher.pending
+            stats['dispatcher_dropped'] = self._dispatcher.dropped_batches
+        return stats
+
+
+    def reset_stats(self):
+        self._stats.reset()
+
+
+    def set_profiler(self, profiler):
+        """Sets a profiling hook called as "profiler(stage, duration_ns)" after
+        each device read (stage "read") and each "process_inputs" call (stage
+        "process"). Pass None to remove the hook."""
+
+        self._profiler = profiler
+
+
+    def subscribe(self, callback, names=None, kinds=None, threshold=0.0, rate_limit=None,
+                  batch=False, executor=None):
+        """Subscribes "callback" to changes of the axes and buttons given by
+        "names" (all if None), filtered by event "kinds", axis move "threshold"
+        and "rate_limit", see "event_dispatcher.subscribe". Callbacks are called
+        from a dispatcher thread, or from the "executor" given with the first
+        subscription, never from the thread reading the device. Returns the
+        subscription, which can be passed to "unsubscribe"."""
+
+        if self._dispatcher is None:
+            self._dispatcher = event_dispatcher(executor)
+            self._dispatcher.start()
+        return self._dispatcher.subscribe(callback, names, kinds, threshold, rate_limit, batch)
+
+
+    def _start_dispatcher(self):
+        """Restarts the dispatcher of the subscriptions, stopped by "disconnect"."""
+
+        if self._dispatcher is not None and not self._dispatcher.running:
+            self._dispatcher.start()
+
+
+    def unsubscribe(self, entry):
+        if self._dispatcher is not None:
+            self._dispatcher.unsubscribe(entry)
+
+
+    def add_chord(self, name, buttons, window=None):
+        """Adds a chord of the buttons specified by name or index, reported as
+        a COMBO event named "name" when all of them are held. With "window" set,
+        the buttons must all be pressed within "window" seconds. Combos are
+        compiled into bitmasks of the current button mapping."""
+
+        if self._combos is None:
+            self._combos = combo_engine(self._button_mapping)
+        self._combos.add_chord(name, buttons, window)
+
+
+    def add_sequence(self, name, steps, timeout=0.5):
+        """Adds a sequence of button presses, reported as a COMBO event named
+        "name" when its steps are pressed in order with at most "timeout"
+        seconds between two steps. A step is a button name or index, or a list
+        of them pressed together."""
+
+        if self._combos is None:
+            self._combos = combo_engine(self._button_mapping)
+        self._combos.add_sequence(name, steps, timeout)
+
+
+    def remove_combo(self, name):
+        if self._combos is not None:
+            self._combos.remove(name)
+
+
+    @property
+    def events_enabled(self):
+        return self._events is not None
+
+
+    @property
+    def events_dropped(self):
+        """Number of events dropped because the event queue was full."""
+
+        return self._events_dropped
+
+
+    def get_state(self):
+        """Returns the latest "gamepad_state" snapshot without blocking. The
+        snapshot is immutable and never changes once it has been published."""
+
+        return self._state
+
+
+    def get_frame(self):
+        """Returns the whole latest state in one call, as a "gamepad_frame"
+        whose "axes" and "buttons" are named records, e.g. "frame.axes.ax1_x"
+        or "frame.buttons.b_1". The record types are built once per mapping
+        and the frame of a snapshot is built only once, so reading all axes
+        and buttons costs no name lookups. Names which are not valid
+        identifiers are replaced with "_<index>"."""
+
+        state = self._state
+        cached_state, frame = self._frame_cache
+        if cached_state is state:
+            return frame
+        if self._axes_record is None and self._buttons_record is None:
+            print('Axis and button mapping not provided')
+            return None
+        frame = gamepad_frame(state.sequence, state.timestamp,
+                              self._axes_record._make(state.axes) if self._axes_record else None,
+                              self._buttons_record._make(state.buttons) if self._buttons_record else None)
+        self._frame_cache = (state, frame)
+        return frame
+
+
+    def get_state_into(self, axes, buttons=None):
+        """Copies the axis states, and the button states if "buttons" is given,
+        of the latest snapshot into caller allocated buffers (lists or NumPy
+        arrays with one item per axis and button) without allocating. Returns
+        the sequence number of the copied snapshot."""
+
+        state = self._state
+        axes[:] = state.axes
+        if buttons is not None:
+            buttons[:] = state.buttons
+        return state.sequence
+
+
     def process_inputs(self):
         """This function is specific to the selected controller. It is used to 
         interpret the bit fields stored in the "raw_inputs" variable and
         read the values of the defined axes and buttons of the controller.
         
         Each controller should have its own implementation of the "process_inputs"
-        function. See example below.
+        function or describe its report with "set_report_layout", in which case
+        the compiled layout decoder is used. See example below.
         """
-        pass
+        if self._decoder is not None:
+            button_mask = self._decoder(self._raw_inputs, self._axis_state, self._button_state)
+            if button_mask is not None:
+                self._button_mask = button_mask
+            if self._axis_filter is not None:
+                self._axis_settling = self._axis_filter(self._axis_state)
 
 
     def get_button_state(self, button_name):
-        """Returns True if the button specified by name or index has been pressed
-        since the last call. Throws ValueError if the button name or index cannot
-        be found."""
+        """Returns True if the button specified by name or index is pressed in
+        the latest state snapshot. Throws ValueError if the button name or index
+        cannot be found."""
 
         try:
             if len(self._button_mapping) < 1:
@@ -243,7 +960,7 @@ class hid_gamepad():
             else:
                 button_index = int(button_name)
 
-            return self._button_state[button_index]
+            return self._state.buttons[button_index]
 
         except KeyError:
             raise ValueError('Button %i was not found' % button_index)
@@ -277,8 +994,9 @@ class hid_gamepad():
 
 
     def get_axis_state(self, axis_name):
-        """Returns floating point value of the axis specified by name or index.
-        Throws ValueError if the button name or index cannot be found."""
+        """Returns floating point value of the axis specified by name or index
+        in the latest state snapshot. Throws ValueError if the button name or index
+        cannot be found."""
 
         try:
             if len(self._axis_mapping) < 1:
@@ -289,7 +1007,7 @@ class hid_gamepad():
             else:
                 axis_index = int(axis_name)
 
-            return self._axis_state[axis_index]
+            return self._state.axes[axis_index]
         except KeyError:
             raise ValueError('Axis %i was not found' % axis_index)
         except ValueError:
@@ -328,6 +1046,10 @@ class hid_gamepad():
             if len(mapping) > 0:
                 self._axis_mapping = mapping
                 self._axis_state = [0.0 for i in range(len(mapping))]
+                self._axis_names = _index_names(mapping)
+                self._axes_record = namedtuple('axes', self._axis_names, rename=True)
+                self._event_axes = list(self._axis_state)
+                self._state = self._state._replace(axes=tuple(self._axis_state))
                 return True
         return False
 
@@ -339,19 +1061,243 @@ class hid_gamepad():
             if len(mapping) > 0:
                 self._button_mapping = mapping
                 self._button_state = [False for i in range(len(mapping))]
+                self._button_mask = 0
+                self._button_names = _index_names(mapping)
+                self._buttons_record = namedtuple('buttons', self._button_names, rename=True)
+                self._state = self._state._replace(buttons=tuple(self._button_state), button_mask=0)
                 return True
         return False
 
 
-    def start_asynchronous(self):
+    def set_report_layout(self, layout):
+        """Sets the axes and buttons of the controller from a "report_layout"
+        describing its input report. The layout is compiled once into a decoder
+        used by "process_inputs"."""
+
+        self._report_layout = layout
+        self._auto_layout = False
+        self._axis_mapping = {}
+        self._axis_state = []
+        self._button_mapping = {}
+        self._button_state = []
+        self.set_axis_mapping(layout.axis_mapping)
+        self.set_button_mapping(layout.button_mapping)
+        self._state = self._state._replace(axes=tuple(self._axis_state), buttons=tuple(self._button_state))
+        self._compile_layout()
+        return True
+
+
+    def set_axis_conditioning(self, axis_name, conditioning):
+        """Sets the "axis_conditioning" (calibration, deadzones, response curve
+        and smoothing) of the axis specified by name, or removes it if
+        "conditioning" is None. The conditioning is baked into a lookup table of
+        the report layout decoder, so it costs nothing extra per report. Throws
+        ValueError if the axis name cannot be found."""
+
+        if self._report_layout is None:
+            raise hid_gamepad.MappingException('Report layout not provided')
+        if axis_name not in self._axis_mapping:
+            raise ValueError('Axis name %s was not found' % axis_name)
+        if conditioning is None:
+            self._axis_conditioning.pop(axis_name, None)
+        else:
+            self._axis_conditioning[axis_name] = conditioning
+        self._compile_layout()
+        return True
+
+
+    def set_stick_deadzone(self, x_axis_name, y_axis_name, deadzone):
+        """Sets the "radial_deadzone" of the stick made of the two axes specified
+        by name, or removes it if "deadzone" is None. Throws ValueError if an axis
+        name cannot be found."""
+
+        if self._report_layout is None:
+            raise hid_gamepad.MappingException('Report layout not provided')
+        for axis_name in (x_axis_name, y_axis_name):
+            if axis_name not in self._axis_mapping:
+                raise ValueError('Axis name %s was not found' % axis_name)
+        if deadzone is None:
+            self._stick_deadzones.pop((x_axis_name, y_axis_name), None)
+        else:
+            self._stick_deadzones[(x_axis_name, y_axis_name)] = deadzone
+        self._compile_layout()
+        return True
+
+
+    def _compile_layout(self):
+        """Compiles the report layout, with the lookup tables of the conditioned
+        axes, into the decoder and the filter applied after it. The next report
+        is decoded even if it is unchanged."""
+
+        layout = condition_layout(self._report_layout, self._axis_conditioning)
+        decoder = layout.compile()
+        axis_filter = compile_filter(layout.axis_mapping, self._axis_conditioning, self._stick_deadzones)
+        with self._lock:
+            self._decode_layout = layout
+            self._decoder = decoder
+            self._axis_filter = axis_filter
+            self._axis_settling = False
+            # the last report decodes differently now, so it must not be skipped
+            self._decoder_changed = True
+            self._array_decoder = None
+
+
+    def enable_history(self, capacity, report_length=None):
+        """Starts keeping the last "capacity" raw reports, including unchanged
+        ones, with their timestamps in a "report_history" ring buffer. By default
+        the buffer is sized for the input report length of the device."""
+
+        if report_length is None:
+            report_length = self.__MAX_BYTES
+        history = report_history(capacity, report_length)
+        with self._lock:
+            self._history = history
+        return history
+
+
+    def disable_history(self):
+        with self._lock:
+            self._history = None
+
+
+    @property
+    def history(self):
+        """Returns the "report_history" of the gamepad or None if it is disabled."""
+
+        return self._history
+
+
+    def get_history(self, count=None):
+        """Returns timestamps and raw reports of the last "count" reports as
+        NumPy arrays, see "report_history.window". Requires NumPy."""
+
+        if self._history is None:
+            raise RuntimeError('Report history is not enabled')
+        with self._lock:
+            return self._history.window(count)
+
+
+    def decode_history(self, count=None):
+        """Decodes the last "count" reports of the history with one vectorized
+        call. Returns a tuple of NumPy arrays: timestamps with shape (n,), axis
+        states with shape (n, axes) and button states with shape (n, buttons).
+        Axis conditioning lookup tables are applied, radial deadzones and
+        smoothing are not. Requires a report layout and NumPy."""
+
+        if self._report_layout is None:
+            raise hid_gamepad.MappingException('Report layout not provided')
+        if self._array_decoder is None:
+            self._array_decoder = self._decode_layout.compile_array()
+        timestamps, reports = self.get_history(count)
+        axes, buttons = self._array_decoder(reports)
+        return timestamps, axes, buttons
+
+
+    def start_recording(self, path):
+        """Starts writing every report read from the device, with its timestamp,
+        to a capture file which can be replayed with "hid_recording.replay_backend"."""
+
+        if not self._is_connected:
+            print('Unable to record - gamepad is not connected')
+            return False
+        descriptor = self._report_descriptor.data if self._report_descriptor is not None else None
+        with self._lock:
+            self.stop_recording()
+            self._recorder = report_recorder(path, self._device_info, descriptor)
+        return True
+
+
+    def stop_recording(self):
+        """Stops writing reports to the capture file."""
+
+        recorder = self._recorder
+        self._recorder = None
+        if recorder is not None:
+            recorder.close()
+
+
+    def start_sharing(self, name=None):
+        """Starts publishing every new state snapshot, with its raw report, into
+        a shared memory segment which other local processes read with
+        "shared_state.shared_state_reader". Returns the name of the segment,
+        generated if "name" is not given. The segment has the axes and buttons
+        of the current mapping, so sharing should start after connecting."""
+
+        with self._lock:
+            self.stop_sharing()
+            self._publisher = shared_state_publisher(name, self._axis_names, self._button_names,
+                                                     self.__MAX_BYTES)
+            if self._state.sequence:
+                self._publisher.publish(self._state)
+        return self._publisher.name
+
+
+    def stop_sharing(self):
+        """Stops publishing states and removes the shared memory segment."""
+
+        publisher = self._publisher
+        self._publisher = None
+        if publisher is not None:
+            publisher.close()
+
+
+    def start_streaming(self, destinations, device_id=0, keyframe_interval=1.0):
+        """Starts sending every new state snapshot as compact binary frames to
+        the given UDP addresses, as (host, port) pairs, or Unix datagram socket
+        paths, where "state_streaming.state_client" receives them."""
+
+        with self._lock:
+            self.stop_streaming()
+            self._streamer = state_publisher(destinations, self._axis_names, self._button_names,
+                                             device_id, keyframe_interval)
+            if self._state.sequence:
+                self._streamer.send_keyframe(self._state)
+        return True
+
+
+    def stop_streaming(self):
+        """Stops sending state snapshots."""
+
+        streamer = self._streamer
+        self._streamer = None
+        if streamer is not None:
+            streamer.close()
+
+
+    def start_supervisor(self, initial_delay=0.001, max_delay=2.0, factor=2.0):
+        """Starts a background thread which reconnects the device as soon as the
+        connection is lost, retrying with an exponential backoff. The delay before
+        the first attempt is "initial_delay" seconds and grows by "factor" with each
+        failed attempt, up to "max_delay" seconds."""
+
+        if self._reconnect_thread is not None and self._reconnect_thread.running:
+            raise RuntimeError('Called start_supervisor when the reconnect thread is already running')
+        self._reconnect_thread = hid_gamepad.reconnect_thread(self, initial_delay, max_delay, factor)
+        self._reconnect_thread.start()
+
+
+    def stop_supervisor(self):
+        """Stops the background thread reconnecting the device. This may be
+        called even if the thread was never started."""
+
+        if self._reconnect_thread is not None:
+            self._reconnect_thread.stop()
+            self._reconnect_thread = None
+
+
+    def start_asynchronous(self, policy=None, timeout=0.1):
             """Starts a background thread which keeps the gamepad state updated automatically.
-            This allows for asynchronous gamepad updates and event callback code."""
+            This allows for asynchronous gamepad updates and event callback code.
+
+            The "policy" selects whether every report is processed (PROCESS_ALL, default)
+            or only the newest pending one (PROCESS_LATEST). The "timeout" is the longest
+            time in seconds the thread waits for a report before checking if it should stop."""
 
             if self._is_connected is True:
                 if self._update_thread is not None:
                     if self._update_thread.running:
                         raise RuntimeError('Called startBackgroundUpdates when the update thread is already running')
-                self._update_thread = hid_gamepad.update_thread(self)
+                self._update_thread = hid_gamepad.update_thread(self, policy, timeout)
                 self._update_thread.start()
 
 
@@ -359,7 +1305,7 @@ class hid_gamepad():
             """Stops the background thread which keeps the gamepad state updated automatically.
             This may be called even if the background thread was never started.
 
-            The thread will stop on the next event after this call was made."""
+            The thread will stop on the next report or timeout after this call was made."""
             if self._update_thread is not None:
                 self._update_thread.running = False
 
@@ -384,4 +1330,24 @@ class hid_gamepad():
                 return None
         else:
             print('Button mapping not avialable - gamepad is not connected')
-            return None
\ No newline at end of file
+            return None
+
+
+def _button_mask(buttons):
+    """Returns the button states of a list as an integer bitmask."""
+
+    mask = 0
+    for index, pressed in enumerate(buttons):
+        if pressed:
+            mask |= 1 << index
+    return mask
+
+
+def _index_names(mapping):
+    """Returns the list of names of a mapping ordered by their indexes."""
+
+    names = [None] * len(mapping)
+    for name, index in mapping.items():
+        if 0 <= index < len(names):
+            names[index] = name
+    return names
@@ -0,0 +1,142 @@
+import contextlib
+import json
+import mmap
+import struct
+
+from hid_backends import paced_device
+
+
+MAGIC = b'HIDREC'
+VERSION = 1
+
+# magic, version, length of the device info JSON, length of the report descriptor
+HEADER = struct.Struct('<6sHII')
+# timestamp in nanoseconds since the start of the recording, report length
+RECORD = struct.Struct('<QH')
+
+
+class report_recorder():
+    """Writes raw reports to a capture file. The file starts with a header
+    holding the device info (as JSON) and the report descriptor, followed by
+    the reports, each stored as its timestamp in nanoseconds relative to the
+    first report, its length and its bytes."""
+
+    def __init__(self, path, device_info, report_descriptor=None):
+        info = json.dumps({key: _to_json(value) for key, value in dict(device_info).items()}).encode()
+        descriptor = bytes(report_descriptor or b'')
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(info), len(descriptor)))
+        self._file.write(info)
+        self._file.write(descriptor)
+        self._first_timestamp = None
+        self.reports_written = 0
+
+    def write(self, raw_inputs, timestamp):
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        self._file.write(RECORD.pack(timestamp - self._first_timestamp, len(raw_inputs)))
+        self._file.write(bytes(raw_inputs))
+        self.reports_written += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class report_replay():
+    """Reads a capture file written by "report_recorder". The file is memory
+    mapped, so reports are streamed from disk instead of being loaded into
+    memory at once."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map.size() < HEADER.size:
+            raise ValueError(f'{path} is not a report capture file')
+        magic, version, info_length, descriptor_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a report capture file')
+        if version != VERSION:
+            raise ValueError(f'Unsupported capture file version {version}')
+        position = HEADER.size
+        self.device_info = json.loads(self._map[position:position + info_length].decode())
+        position += info_length
+        self.report_descriptor = self._map[position:position + descriptor_length] or None
+        self._data_offset = position + descriptor_length
+
+    def __iter__(self):
+        """Yields (timestamp, report) pairs. Reports are memoryview slices of
+        the mapped file, valid until the next pair is requested; copy a report
+        to keep it. The views are released when the iteration ends or the
+        iterator is closed, so the file can be closed afterwards."""
+
+        view = memoryview(self._map)
+        report = None
+        try:
+            position = self._data_offset
+            end = len(self._map)
+            while position + RECORD.size <= end:
+                timestamp, length = RECORD.unpack_from(self._map, position)
+                position += RECORD.size
+                if position + length > end:
+                    break
+                report = view[position:position + length]
+                yield timestamp, report
+                report.release()
+                position += length
+        finally:
+            if report is not None:
+                report.release()
+            view.release()
+
+    def close(self):
+        """Closes the mapped file. Iterators not exhausted yet must be closed first."""
+
+        self._map.close()
+
+
+class replay_backend():
+    """Device backend replaying a capture file in place of a physical device.
+    With "realtime" set reports are delivered at their recorded pace, otherwise
+    as fast as they are read. With "loop" set the capture restarts at its end."""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self._replay = report_replay(path)
+        self._realtime = realtime
+        self._loop = loop
+        self._iterators = []
+        self.device_info = self._replay.device_info
+
+    def enumerate(self):
+        return [self.device_info]
+
+    def open(self, target_device):
+        reports = self._reports()
+        self._iterators.append(reports)
+        return paced_device(reports, self._realtime, self._replay.report_descriptor)
+
+    def close(self):
+        """Ends the replay of all opened devices and closes the capture file."""
+
+        for reports in self._iterators:
+            reports.close()
+        self._iterators = []
+        self._replay.close()
+
+    def _reports(self):
+        offset = 0
+        while True:
+            last = None
+            with contextlib.closing(iter(self._replay)) as replay:
+                for timestamp, report in replay:
+                    last = timestamp
+                    yield offset + timestamp, report
+            if not self._loop or last is None:
+                return
+            offset += last + 1
+
+
+def _to_json(value):
+    if isinstance(value, bytes):
+        return value.decode(errors='replace')
+    return value
@@ -19,22 +19,16 @@ if __name__ == "__main__":
         if my_gamepad.connect(available_gamepads[selected_gamepad]):
             print("\nConnection established with selected gampad.")
             print("Reporting gampad raw input states.")
+            my_gamepad.start_supervisor()
             while True:
                 if my_gamepad.update_state():
                     time.sleep(100/1000)
-                    ax1_x = my_gamepad.get_axis_state("ax1_x")
-                    ax1_y = my_gamepad.get_axis_state("ax1_y")
-                    ax2_x = my_gamepad.get_axis_state("ax2_x")
-                    ax2_y = my_gamepad.get_axis_state("ax2_y")
-                    b_1 = my_gamepad.get_button_state("b_1")
-                    b_2 = my_gamepad.get_button_state("b_2")
-                    b_3 = my_gamepad.get_button_state("b_3")
-                    b_4 = my_gamepad.get_button_state("b_4")
-                    print(f"x1 axis: {ax1_x}, y1 axis: {ax1_y}, x2 axis: {ax2_x}, y2 axis: {ax2_y}, button 1: {b_1}, button 2: {b_2}, button 3: {b_3}, button 4: {b_4}")
+                    frame = my_gamepad.get_frame()
+                    print(f"x1 axis: {frame.axes.ax1_x}, y1 axis: {frame.axes.ax1_y}, x2 axis: {frame.axes.ax2_x}, y2 axis: {frame.axes.ax2_y}, " +
+                          f"button 1: {frame.buttons.b_1}, button 2: {frame.buttons.b_2}, button 3: {frame.buttons.b_3}, button 4: {frame.buttons.b_4}")
                     
                 else:
                     if my_gamepad.is_connected is False:
-                        my_gamepad.reconnect()
-                        time.sleep(2000/1000)
+                        my_gamepad.wait_connected()
     else:
         print("\nUnable to find gamped devices.")
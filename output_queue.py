@@ -0,0 +1,82 @@
+import threading
+import time
+
+
+class output_queue():
+    """Queue of output and feature reports (e.g. rumble or LED states) to be
+    written to one device. A report supersedes the pending report of the same
+    kind and report id (its first byte), so a burst of updates collapses into
+    the latest one. Reports are written by "flush", at most one every
+    "min_interval" seconds, from the loop reading the device."""
+
+    def __init__(self, min_interval=0.004):
+        self.min_interval = min_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_write = None
+        self.reports_queued = 0
+        self.reports_coalesced = 0
+        self.reports_written = 0
+        self.write_errors = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, report, feature=False):
+        """Queues a report. Returns True if it replaced a pending report."""
+
+        report = bytes(report)
+        if not report:
+            raise ValueError('An output report needs at least the report id byte')
+        key = (feature, report[0])
+        with self._lock:
+            coalesced = key in self._pending
+            self._pending[key] = report
+            self.reports_queued += 1
+            if coalesced:
+                self.reports_coalesced += 1
+        return coalesced
+
+    def clear(self):
+        with self._lock:
+            self._pending = {}
+
+    def delay(self, now=None):
+        """Returns the number of seconds until the next report may be written,
+        0.0 if it may be written now, or None if nothing is pending."""
+
+        if not self._pending:
+            return None
+        if self._last_write is None:
+            return 0.0
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self._last_write + self.min_interval - now)
+
+    def flush(self, device):
+        """Writes the oldest pending report to "device" if the rate limit allows
+        it. Returns the number of seconds until the next write is due, or None
+        if nothing is left pending. Reports failing with OSError are dropped."""
+
+        now = time.monotonic()
+        with self._lock:
+            # checked under the lock, "clear" may empty the queue from another thread
+            delay = self.delay(now)
+            if delay is None or delay > 0:
+                return delay
+            key = next(iter(self._pending))
+            report = self._pending.pop(key)
+        try:
+            if key[0]:
+                result = device.send_feature_report(report)
+            else:
+                result = device.write(report)
+            # hidapi returns -1 instead of raising
+            if result is not None and result < 0:
+                raise OSError('write failed')
+            self.reports_written += 1
+        except OSError as error:
+            print(f'Unable to write the output report: {error}')
+            self.write_errors += 1
+        self._last_write = now
+        return self.delay(now)
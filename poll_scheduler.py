@@ -0,0 +1,127 @@
+import time
+
+
+class poll_scheduler():
+    """Schedules the synchronous "update_state" polling of many gamepads.
+
+    For each gamepad the scheduler learns the interval between its reports
+    from the number of reports read over time, and wakes just before the next
+    report is expected instead of polling in a tight loop or with a fixed
+    sleep. Every poll reads all pending reports of the gamepad. When a
+    gamepad is idle, i.e. its state has not changed for "idle_after" seconds
+    (unchanged reports or no reports at all), the polling interval doubles
+    with every poll up to "idle_interval" seconds. The first changed report
+    brings the gamepad back to its full report rate.
+
+    Usage example:
+        scheduler = poll_scheduler([gamepad_1, gamepad_2])
+        while True:
+            for gamepad in scheduler.poll():
+                print(gamepad.get_state())"""
+
+    # weight of the newest measurement in the report interval estimate
+    INTERVAL_SMOOTHING = 0.2
+    # limit of the reports read from one gamepad in one poll
+    MAX_DRAIN = 64
+
+    class entry():
+        """Scheduling data of one gamepad."""
+
+        def __init__(self, gamepad, interval, now):
+            self.gamepad = gamepad
+            self.interval = interval
+            self.delay = interval
+            self.due = now
+            self.last_read = now
+            self.last_change = now
+
+    def __init__(self, gamepads=(), initial_interval=0.004, min_interval=0.0001,
+                 idle_after=0.5, idle_interval=0.05, lead=0.0001):
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.idle_after = idle_after
+        self.idle_interval = idle_interval
+        self.lead = lead
+        self._entries = []
+        for gamepad in gamepads:
+            self.add(gamepad)
+
+    def add(self, gamepad):
+        self._entries.append(poll_scheduler.entry(gamepad, self.initial_interval, time.monotonic()))
+
+    def remove(self, gamepad):
+        self._entries = [entry for entry in self._entries if entry.gamepad is not gamepad]
+
+    def report_interval(self, gamepad):
+        """Returns the learned report interval of a gamepad in seconds."""
+
+        for entry in self._entries:
+            if entry.gamepad is gamepad:
+                return entry.interval
+        raise ValueError('Gamepad is not scheduled')
+
+    def next_due(self):
+        """Returns the monotonic time of the next scheduled poll, or None."""
+
+        if not self._entries:
+            return None
+        return min(entry.due for entry in self._entries)
+
+    def poll(self, timeout=None):
+        """Sleeps until the next gamepad is due, at most "timeout" seconds,
+        polls the due gamepads and returns the list of those whose state
+        changed."""
+
+        due = self.next_due()
+        if due is None:
+            if timeout:
+                time.sleep(timeout)
+            return []
+        delay = due - time.monotonic()
+        if timeout is not None:
+            delay = min(delay, timeout)
+        if delay > 0:
+            time.sleep(delay)
+
+        changed = []
+        now = time.monotonic()
+        for entry in self._entries:
+            if entry.due <= now:
+                if self._poll_entry(entry, now):
+                    changed.append(entry.gamepad)
+        return changed
+
+    def _poll_entry(self, entry, now):
+        gamepad = entry.gamepad
+        if not gamepad.is_connected:
+            entry.due = now + self.idle_interval
+            return False
+
+        sequence = gamepad.get_state().sequence
+        reports = 0
+        while reports < self.MAX_DRAIN and gamepad.update_state():
+            reports += 1
+        now = time.monotonic()
+        changed = gamepad.get_state().sequence != sequence
+        idle = now - entry.last_change > self.idle_after
+
+        if reports and not idle:
+            measured = (now - entry.last_read) / reports
+            entry.interval += (measured - entry.interval) * self.INTERVAL_SMOOTHING
+        if reports:
+            entry.last_read = now
+        if changed:
+            entry.last_change = now
+            idle = False
+
+        if idle:
+            # back off sharply, the first change returns to the full rate
+            entry.delay = min(self.idle_interval, max(entry.delay, entry.interval) * 2)
+        elif reports:
+            # wake just before the next report is expected
+            entry.delay = max(self.min_interval, entry.interval - self.lead)
+        else:
+            # woke too early, retry shortly
+            entry.delay = max(self.min_interval, entry.interval / 4)
+        entry.due = now + entry.delay
+        return changed
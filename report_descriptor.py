@@ -0,0 +1,219 @@
+from collections import namedtuple
+
+from report_layout import report_layout, HAT_8_WAY, HAT_4_WAY
+
+
+report_field = namedtuple('report_field', 'report_id usage_page usage bit_offset bit_size logical_min logical_max flags')
+
+# Item tags of the short items, see "Device Class Definition for HID 1.11", chapter 6.2.2
+MAIN_INPUT = 0x8
+MAIN_OUTPUT = 0x9
+MAIN_FEATURE = 0xB
+MAIN_COLLECTION = 0xA
+MAIN_END_COLLECTION = 0xC
+
+GLOBAL_USAGE_PAGE = 0x0
+GLOBAL_LOGICAL_MINIMUM = 0x1
+GLOBAL_LOGICAL_MAXIMUM = 0x2
+GLOBAL_REPORT_SIZE = 0x7
+GLOBAL_REPORT_ID = 0x8
+GLOBAL_REPORT_COUNT = 0x9
+GLOBAL_PUSH = 0xA
+GLOBAL_POP = 0xB
+
+LOCAL_USAGE = 0x0
+LOCAL_USAGE_MINIMUM = 0x1
+LOCAL_USAGE_MAXIMUM = 0x2
+
+FLAG_CONSTANT = 0x01
+FLAG_VARIABLE = 0x02
+
+USAGE_PAGE_GENERIC_DESKTOP = 0x01
+USAGE_PAGE_SIMULATION = 0x02
+USAGE_PAGE_BUTTON = 0x09
+
+USAGE_HAT_SWITCH = 0x39
+
+AXIS_NAMES = {
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x30): 'x',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x31): 'y',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x32): 'z',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x33): 'rx',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x34): 'ry',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x35): 'rz',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x36): 'slider',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x37): 'dial',
+    (USAGE_PAGE_GENERIC_DESKTOP, 0x38): 'wheel',
+    (USAGE_PAGE_SIMULATION, 0xBA): 'rudder',
+    (USAGE_PAGE_SIMULATION, 0xBB): 'throttle',
+    (USAGE_PAGE_SIMULATION, 0xC4): 'accelerator',
+    (USAGE_PAGE_SIMULATION, 0xC5): 'brake',
+    (USAGE_PAGE_SIMULATION, 0xC8): 'steering',
+}
+
+
+class report_descriptor():
+    """Parsed HID report descriptor. Holds the fields of the input reports
+    with their usages, bit offsets and logical ranges and the lengths of the
+    input reports in bytes, as returned by the device read."""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.input_fields = []
+        self.input_report_lengths = {}
+        self._parse(self.data)
+
+    @property
+    def uses_report_ids(self):
+        return any(report_id != 0 for report_id in self.input_report_lengths)
+
+    @property
+    def input_report_length(self):
+        """Length in bytes of the longest input report, 0 if there is none."""
+
+        return max(self.input_report_lengths.values(), default=0)
+
+    def _parse(self, data):
+        state = {'usage_page': 0, 'logical_min': 0, 'logical_max': 0,
+                 'report_size': 0, 'report_id': 0, 'report_count': 0}
+        stack = []
+        usages = []
+        usage_min = None
+        bit_offsets = {}
+        position = 0
+
+        while position < len(data):
+            prefix = data[position]
+            if prefix == 0xFE:
+                # long items are not used by the HID 1.11 specification
+                if position + 1 >= len(data):
+                    break
+                position += 3 + data[position + 1]
+                continue
+
+            size = (0, 1, 2, 4)[prefix & 0x03]
+            item_type = (prefix >> 2) & 0x03
+            tag = prefix >> 4
+            payload = data[position + 1:position + 1 + size]
+            position += 1 + size
+            if len(payload) < size:
+                raise ValueError('Truncated report descriptor')
+            unsigned = int.from_bytes(payload, 'little')
+            signed = int.from_bytes(payload, 'little', signed=True)
+
+            if item_type == 0:
+                if tag in (MAIN_INPUT, MAIN_OUTPUT, MAIN_FEATURE):
+                    report_id = state['report_id']
+                    offset = bit_offsets.get((tag, report_id), 8 if report_id else 0)
+                    if tag == MAIN_INPUT:
+                        self._add_input_fields(state, usages, offset, unsigned)
+                    offset += state['report_size'] * state['report_count']
+                    bit_offsets[(tag, report_id)] = offset
+                    if tag == MAIN_INPUT:
+                        self.input_report_lengths[report_id] = (offset + 7) // 8
+                usages = []
+                usage_min = None
+            elif item_type == 1:
+                if tag == GLOBAL_USAGE_PAGE:
+                    state['usage_page'] = unsigned
+                elif tag == GLOBAL_LOGICAL_MINIMUM:
+                    state['logical_min'] = signed
+                elif tag == GLOBAL_LOGICAL_MAXIMUM:
+                    state['logical_max'] = signed
+                    if state['logical_min'] >= 0 and signed < state['logical_min']:
+                        # a common descriptor quirk, e.g. maximum 255 stored in one byte
+                        state['logical_max'] = unsigned
+                elif tag == GLOBAL_REPORT_SIZE:
+                    state['report_size'] = unsigned
+                elif tag == GLOBAL_REPORT_ID:
+                    state['report_id'] = unsigned
+                elif tag == GLOBAL_REPORT_COUNT:
+                    state['report_count'] = unsigned
+                elif tag == GLOBAL_PUSH:
+                    stack.append(dict(state))
+                elif tag == GLOBAL_POP:
+                    if stack:
+                        state = stack.pop()
+            elif item_type == 2:
+                if size == 4:
+                    usage = (unsigned >> 16, unsigned & 0xFFFF)
+                else:
+                    usage = (state['usage_page'], unsigned)
+                if tag == LOCAL_USAGE:
+                    usages.append(usage)
+                elif tag == LOCAL_USAGE_MINIMUM:
+                    usage_min = usage
+                elif tag == LOCAL_USAGE_MAXIMUM and usage_min is not None:
+                    usages.extend((usage_min[0], value) for value in range(usage_min[1], usage[1] + 1))
+                    usage_min = None
+
+    def _add_input_fields(self, state, usages, offset, flags):
+        if flags & FLAG_CONSTANT or not flags & FLAG_VARIABLE or not usages:
+            # padding and array items do not map to single axes or buttons
+            return
+        for index in range(state['report_count']):
+            usage_page, usage = usages[min(index, len(usages) - 1)]
+            self.input_fields.append(report_field(
+                state['report_id'], usage_page, usage,
+                offset + index * state['report_size'], state['report_size'],
+                state['logical_min'], state['logical_max'], flags))
+
+    def build_layout(self):
+        """Builds a "report_layout" for the input report with the most axes and
+        buttons. Axes are named after their usages ("x", "y", "rz", ...), hat
+        switches become "hat_x" and "hat_y" axes and buttons are named "button_1",
+        "button_2" and so on. Returns None if no axis or button was found."""
+
+        counts = {}
+        for field in self.input_fields:
+            if _is_mappable(field):
+                counts[field.report_id] = counts.get(field.report_id, 0) + 1
+        if not counts:
+            return None
+
+        report_id = max(counts, key=counts.get)
+        layout = report_layout(report_id if report_id else None)
+        for field in self.input_fields:
+            if field.report_id != report_id or not _is_mappable(field):
+                continue
+            offset, shift = divmod(field.bit_offset, 8)
+            size = (shift + field.bit_size + 7) // 8
+            mask = ((1 << field.bit_size) - 1) << shift
+
+            if field.usage_page == USAGE_PAGE_BUTTON:
+                layout.add_button(_unique_name(f'button_{field.usage}', layout.button_mapping), offset, mask)
+            elif (field.usage_page, field.usage) == (USAGE_PAGE_GENERIC_DESKTOP, USAGE_HAT_SWITCH):
+                positions = HAT_4_WAY if field.logical_max - field.logical_min == 3 else HAT_8_WAY
+                x_name = _unique_name('hat_x', layout.axis_mapping)
+                y_name = _unique_name('hat_y', layout.axis_mapping)
+                lookup_min = field.logical_min & ((1 << field.bit_size) - 1)
+                layout.add_hat(x_name, y_name, offset, mask, shift, lookup_min, positions)
+            else:
+                center = (field.logical_max + field.logical_min) / 2
+                scale = (field.logical_max - field.logical_min) / 2 or 1
+                name = _unique_name(AXIS_NAMES[(field.usage_page, field.usage)], layout.axis_mapping)
+                layout.add_axis(name, offset, size, mask, shift, field.logical_min < 0, center, scale)
+        return layout
+
+
+def parse_report_descriptor(data):
+    """Parses a HID report descriptor given as bytes or list of ints."""
+
+    return report_descriptor(data)
+
+
+def _is_mappable(field):
+    if field.usage_page == USAGE_PAGE_BUTTON:
+        return True
+    if (field.usage_page, field.usage) == (USAGE_PAGE_GENERIC_DESKTOP, USAGE_HAT_SWITCH):
+        return True
+    return (field.usage_page, field.usage) in AXIS_NAMES
+
+
+def _unique_name(name, mapping):
+    if name not in mapping:
+        return name
+    index = 2
+    while f'{name}_{index}' in mapping:
+        index += 1
+    return f'{name}_{index}'
@@ -0,0 +1,79 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class report_history():
+    """Fixed capacity ring buffer of the last raw reports. Reports are stored
+    in one preallocated contiguous byte array, with "report_length" bytes per
+    report, and their monotonic timestamps in nanoseconds in a parallel array.
+    Shorter reports are padded with zeros, longer ones are truncated.
+
+    The "window" method returns the stored reports as NumPy arrays ready for
+    a vectorized decoder, see "report_layout.compile_array"."""
+
+    def __init__(self, capacity, report_length):
+        if capacity < 1 or report_length < 1:
+            raise ValueError('History capacity and report length must be positive')
+        self.capacity = capacity
+        self.report_length = report_length
+        self._data = bytearray(capacity * report_length)
+        self._timestamps = array('Q', bytes(8 * capacity))
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def total_reports(self):
+        """Number of reports appended since the history was created."""
+
+        return self._count
+
+    def append(self, raw_inputs, timestamp):
+        index = self._count % self.capacity
+        start = index * self.report_length
+        length = min(len(raw_inputs), self.report_length)
+        self._data[start:start + length] = raw_inputs[:length]
+        if length < self.report_length:
+            self._data[start + length:start + self.report_length] = bytes(self.report_length - length)
+        self._timestamps[index] = timestamp
+        self._count += 1
+
+    def clear(self):
+        self._count = 0
+
+    def reports(self, count=None):
+        """Yields (timestamp, report) pairs of the last "count" reports, oldest
+        first. Reports are memoryview slices of the buffer and are overwritten
+        once the ring wraps around."""
+
+        view = memoryview(self._data)
+        for index in self._indexes(count):
+            start = index * self.report_length
+            yield self._timestamps[index], view[start:start + self.report_length]
+
+    def window(self, count=None):
+        """Returns the last "count" reports, oldest first, as a pair of NumPy
+        arrays: timestamps with shape (n,) and reports with shape (n, report_length).
+        Both arrays are copies and stay valid when new reports arrive."""
+
+        if numpy is None:
+            raise ImportError('numpy is required to read the report history as arrays')
+        size = len(self)
+        if count is not None:
+            size = min(size, count)
+        first = (self._count - size) % self.capacity
+        order = (numpy.arange(size) + first) % self.capacity
+        data = numpy.frombuffer(self._data, dtype=numpy.uint8).reshape(self.capacity, self.report_length)
+        timestamps = numpy.frombuffer(self._timestamps, dtype=numpy.uint64)
+        return timestamps[order], data[order]
+
+    def _indexes(self, count):
+        size = len(self)
+        if count is not None:
+            size = min(size, count)
+        return [(self._count - size + i) % self.capacity for i in range(size)]
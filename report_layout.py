@@ -0,0 +1,238 @@
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+axis_field = namedtuple('axis_field', 'name offset size mask shift signed center scale lookup')
+button_field = namedtuple('button_field', 'name offset mask')
+
+# Hat switch positions as (x, y) pairs, listed clockwise starting from "up".
+HAT_8_WAY = ((0.0, -1.0), (1.0, -1.0), (1.0, 0.0), (1.0, 1.0),
+             (0.0, 1.0), (-1.0, 1.0), (-1.0, 0.0), (-1.0, -1.0))
+HAT_4_WAY = ((0.0, -1.0), (1.0, 0.0), (0.0, 1.0), (-1.0, 0.0))
+
+
+class report_layout():
+    """Declarative description of the input report of a controller. Axes and
+    buttons are described by the position of their bits in the report and the
+    layout is compiled once into a decoder function, which fills the axis and
+    button states of a report in one pass.
+
+    Axes and buttons get indexes in the order in which they are added, so the
+    layout also defines the axis and button mapping of the controller."""
+
+    def __init__(self, report_id=None):
+        self.report_id = report_id
+        self._axes = []
+        self._buttons = []
+
+    @property
+    def axis_mapping(self):
+        """Dictionary with axis names as keys and axis indexes as values."""
+
+        return {field.name: index for index, field in enumerate(self._axes)}
+
+    @property
+    def button_mapping(self):
+        """Dictionary with button names as keys and button indexes as values."""
+
+        return {field.name: index for index, field in enumerate(self._buttons)}
+
+    @property
+    def axes(self):
+        return tuple(self._axes)
+
+    @property
+    def buttons(self):
+        return tuple(self._buttons)
+
+    @property
+    def report_length(self):
+        """Minimal number of bytes a report needs to be decoded with this layout."""
+
+        length = 0 if self.report_id is None else 1
+        for field in self._axes:
+            length = max(length, field.offset + field.size)
+        for field in self._buttons:
+            if field.offset is not None:
+                length = max(length, field.offset + 1)
+        return length
+
+    def add_axis(self, name, offset, size=1, mask=None, shift=0, signed=False,
+                 center=None, scale=None, lookup=None):
+        """Adds an axis read from "size" bytes (little endian) starting at byte
+        "offset" of the report. The raw value is masked with "mask", shifted right
+        by "shift" bits and, if "signed" is set, sign extended. The state of the
+        axis is then "(raw - center) / scale", or "lookup[raw]" if a lookup table
+        is given. By default the value is centered and scaled to the -1.0 to 1.0
+        range of an unsigned field."""
+
+        if name in self.axis_mapping:
+            raise ValueError(f'Axis {name} is already defined')
+        if mask is None:
+            mask = (1 << (8 * size)) - 1
+        bits = (mask >> shift).bit_length()
+        if center is None:
+            center = 0 if signed else 1 << (bits - 1)
+        if scale is None:
+            scale = 1 << (bits - 1)
+        if lookup is not None:
+            lookup = tuple(lookup)
+        self._axes.append(axis_field(name, offset, size, mask, shift, signed, center, scale, lookup))
+        return len(self._axes) - 1
+
+    def add_button(self, name, offset=None, mask=1):
+        """Adds a button which is pressed when any of the "mask" bits of the byte
+        at "offset" is set. A button without "offset" is not reported by the
+        device and always stays released."""
+
+        if name in self.button_mapping:
+            raise ValueError(f'Button {name} is already defined')
+        self._buttons.append(button_field(name, offset, mask))
+        return len(self._buttons) - 1
+
+    def add_hat(self, x_name, y_name, offset, mask=0x0F, shift=0, logical_min=0, positions=HAT_8_WAY):
+        """Adds a hat switch as a pair of axes. Raw values from "logical_min" on
+        select the consecutive "positions", any other value is the centered hat."""
+
+        size = (mask.bit_length() + 7) // 8
+        x_lookup = [0.0] * ((mask >> shift) + 1)
+        y_lookup = [0.0] * ((mask >> shift) + 1)
+        for index, (x, y) in enumerate(positions):
+            if logical_min + index < len(x_lookup):
+                x_lookup[logical_min + index] = x
+                y_lookup[logical_min + index] = y
+        self.add_axis(x_name, offset, size, mask, shift, lookup=x_lookup)
+        self.add_axis(y_name, offset, size, mask, shift, lookup=y_lookup)
+
+    def with_lookups(self, lookups):
+        """Returns a copy of the layout in which the axes named in the "lookups"
+        dictionary read their state from the given lookup tables."""
+
+        layout = report_layout(self.report_id)
+        layout._axes = [field._replace(lookup=tuple(lookups[field.name])) if field.name in lookups else field
+                        for field in self._axes]
+        layout._buttons = list(self._buttons)
+        return layout
+
+    def compile(self):
+        """Compiles the layout into a decoder function "decoder(raw, axes, buttons)".
+        The decoder writes the axis and button states of the "raw" report into the
+        "axes" and "buttons" lists and returns the button states as an integer
+        bitmask (bit "n" is the button with index "n"), or returns None without
+        touching the lists when the report is too short or has another report id.
+
+        The bitmask is read straight from the report bytes: buttons whose bits
+        keep the same relative order in a byte are extracted with one mask and
+        shift per group."""
+
+        namespace = {}
+        lines = ['def decoder(r, a, b):',
+                 f'    if len(r) < {self.report_length}:',
+                 '        return None']
+        if self.report_id is not None:
+            lines += [f'    if r[0] != {self.report_id}:',
+                      '        return None']
+        for index, field in enumerate(self._axes):
+            value = _raw_value(field)
+            if field.lookup is not None:
+                namespace[f'lookup_{index}'] = field.lookup
+                lines.append(f'    a[{index}] = lookup_{index}[{value}]')
+            else:
+                lines.append(f'    a[{index}] = ({value} - {field.center!r}) / {field.scale!r}')
+        lines.append(f'    m = {self.button_mask_source()}')
+        for index, field in enumerate(self._buttons):
+            if field.offset is not None:
+                lines.append(f'    b[{index}] = m >> {index} & 1 == 1')
+        lines.append('    return m')
+
+        exec(compile('\n'.join(lines), '<report_layout>', 'exec'), namespace)
+        return namespace['decoder']
+
+    def button_mask_source(self):
+        """Returns the source of an expression computing the button bitmask of
+        a report "r"."""
+
+        groups = {}
+        terms = []
+        for index, field in enumerate(self._buttons):
+            if field.offset is None:
+                continue
+            if field.mask & (field.mask - 1) == 0:
+                # single bit buttons are grouped by byte and distance to their index
+                shift = index - (field.mask.bit_length() - 1)
+                key = (field.offset, shift)
+                groups[key] = groups.get(key, 0) | field.mask
+            else:
+                terms.append(f'((r[{field.offset}] & {field.mask}) != 0) << {index}')
+        for (offset, shift), mask in groups.items():
+            term = f'(r[{offset}] & {mask})'
+            if shift > 0:
+                term += f' << {shift}'
+            elif shift < 0:
+                term += f' >> {-shift}'
+            terms.append(term)
+        return ' | '.join(terms) or '0'
+
+    def compile_array(self):
+        """Compiles the layout into a vectorized decoder "decoder(reports)" for
+        a whole window of reports given as an (n, report_length) uint8 NumPy array.
+        The decoder returns a pair of arrays: axis states with shape (n, axes)
+        and button states with shape (n, buttons). Rows with another report id
+        have NaN axes and released buttons. Requires NumPy."""
+
+        if numpy is None:
+            raise ImportError('numpy is required to compile a vectorized decoder')
+
+        report_id = self.report_id
+        length = self.report_length
+        axes = [(field, None if field.lookup is None else numpy.array(field.lookup))
+                for field in self._axes]
+        buttons = [(index, field) for index, field in enumerate(self._buttons) if field.offset is not None]
+        button_count = len(self._buttons)
+
+        def decoder(reports):
+            reports = numpy.asarray(reports, dtype=numpy.uint8)
+            if reports.ndim != 2 or reports.shape[1] < length:
+                raise ValueError(f'Reports must be an array with at least {length} columns')
+            axis_states = numpy.empty((reports.shape[0], len(axes)))
+            button_states = numpy.zeros((reports.shape[0], button_count), dtype=bool)
+            for index, (field, lookup) in enumerate(axes):
+                raw = reports[:, field.offset].astype(numpy.int64)
+                for byte in range(1, field.size):
+                    raw |= reports[:, field.offset + byte].astype(numpy.int64) << (8 * byte)
+                raw = (raw & field.mask) >> field.shift
+                if field.signed:
+                    sign_bit = 1 << ((field.mask >> field.shift).bit_length() - 1)
+                    raw = (raw ^ sign_bit) - sign_bit
+                if lookup is not None:
+                    axis_states[:, index] = lookup[raw]
+                else:
+                    axis_states[:, index] = (raw - field.center) / field.scale
+            for index, field in buttons:
+                button_states[:, index] = (reports[:, field.offset] & field.mask) != 0
+            if report_id is not None:
+                other = reports[:, 0] != report_id
+                axis_states[other] = numpy.nan
+                button_states[other] = False
+            return axis_states, button_states
+
+        return decoder
+
+
+def _raw_value(field):
+    """Returns the source of an expression reading the raw integer of an axis field."""
+
+    value = ' | '.join(f'r[{field.offset + i}] << {8 * i}' if i else f'r[{field.offset}]'
+                       for i in range(field.size))
+    if field.mask != (1 << (8 * field.size)) - 1:
+        value = f'({value}) & {field.mask}'
+    if field.shift:
+        value = f'({value}) >> {field.shift}'
+    if field.signed:
+        sign_bit = 1 << ((field.mask >> field.shift).bit_length() - 1)
+        value = f'(({value}) ^ {sign_bit}) - {sign_bit}'
+    return f'({value})'
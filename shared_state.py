@@ -0,0 +1,182 @@
+import json
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+from gamepad_events import gamepad_state
+
+
+MAGIC = b'HIDSTATE'
+VERSION = 1
+
+# magic, version, axis count, button count, raw report capacity, length of the names JSON
+HEADER = struct.Struct('<8sHHHHI')
+# seqlock counter, odd while a frame is being written
+COUNTER = struct.Struct('<Q')
+
+# names of the segments created by the publishers of this process
+_created = set()
+
+
+def _frame_struct(axis_count, button_count, report_capacity):
+    """Returns the struct of a frame: state sequence, timestamp in nanoseconds,
+    raw report length, axis values, button states and the raw report."""
+
+    return struct.Struct(f'<QQH{axis_count}d{button_count}?{report_capacity}s')
+
+
+def _counter_offset(names_length):
+    return (HEADER.size + names_length + 7) // 8 * 8
+
+
+class shared_state_publisher():
+    """Publishes gamepad state snapshots into a named shared memory segment
+    with a fixed layout: a header with the axis and button names, a seqlock
+    counter and one frame holding the latest state and raw report.
+
+    The counter is odd while a frame is being written and even otherwise, so
+    readers in any number of local processes can read the latest frame
+    directly from the mapped memory, without locks or system calls, and retry
+    when the frame changed while they read it. There must be one publisher
+    per segment."""
+
+    def __init__(self, name, axis_names, button_names, report_capacity=128):
+        names = json.dumps({'axes': list(axis_names), 'buttons': list(button_names)}).encode()
+        self._frame = _frame_struct(len(axis_names), len(button_names), report_capacity)
+        self._counter_offset = _counter_offset(len(names))
+        self._frame_offset = self._counter_offset + COUNTER.size
+        self._memory = shared_memory.SharedMemory(name, create=True,
+                                                  size=self._frame_offset + self._frame.size)
+        _created.add(self._memory.name)
+        self._buffer = self._memory.buf
+        HEADER.pack_into(self._buffer, 0, MAGIC, VERSION, len(axis_names), len(button_names),
+                         report_capacity, len(names))
+        self._buffer[HEADER.size:HEADER.size + len(names)] = names
+        self._counter = 0
+        self.axis_count = len(axis_names)
+        self.button_count = len(button_names)
+        self.report_capacity = report_capacity
+        self.frames_published = 0
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def publish(self, state):
+        """Writes a "gamepad_state" into the shared frame. States with another
+        number of axes or buttons than the segment was created for are skipped."""
+
+        if len(state.axes) != self.axis_count or len(state.buttons) != self.button_count:
+            return False
+        raw_inputs = state.raw_inputs[:self.report_capacity]
+        self._counter += 1
+        COUNTER.pack_into(self._buffer, self._counter_offset, self._counter)
+        self._frame.pack_into(self._buffer, self._frame_offset, state.sequence, state.timestamp,
+                              len(raw_inputs), *state.axes, *state.buttons, raw_inputs)
+        self._counter += 1
+        COUNTER.pack_into(self._buffer, self._counter_offset, self._counter)
+        self.frames_published += 1
+        return True
+
+    def close(self):
+        """Closes and removes the shared memory segment."""
+
+        if self._memory is not None:
+            _created.discard(self._memory.name)
+            self._buffer.release()
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+class shared_state_reader():
+    """Reads the states published by a "shared_state_publisher" from another
+    process. "read" returns the latest frame as a "gamepad_state"."""
+
+    def __init__(self, name):
+        self._memory = _attach(name)
+        self._buffer = self._memory.buf
+        magic, version, axis_count, button_count, report_capacity, names_length = \
+            HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{name} is not a gamepad state segment')
+        if version != VERSION:
+            self.close()
+            raise ValueError(f'Unsupported gamepad state segment version {version}')
+        names = json.loads(bytes(self._buffer[HEADER.size:HEADER.size + names_length]).decode())
+        self.axis_names = names['axes']
+        self.button_names = names['buttons']
+        self.axis_mapping = {name: index for index, name in enumerate(self.axis_names)}
+        self.button_mapping = {name: index for index, name in enumerate(self.button_names)}
+        self._frame = _frame_struct(axis_count, button_count, report_capacity)
+        self._counter_offset = _counter_offset(names_length)
+        self._frame_offset = self._counter_offset + COUNTER.size
+        self._axis_count = axis_count
+        self._button_count = button_count
+
+    @property
+    def counter(self):
+        """Seqlock counter of the segment. It changes with every published frame,
+        so comparing it with a previous value tells whether a new frame is available."""
+
+        return COUNTER.unpack_from(self._buffer, self._counter_offset)[0]
+
+    def read(self, timeout=1.0):
+        """Returns the latest published "gamepad_state", or None if nothing was
+        published yet. Raises TimeoutError if no consistent frame could be read
+        within "timeout" seconds, which happens when the publisher died while
+        writing."""
+
+        deadline = None
+        while True:
+            before = COUNTER.unpack_from(self._buffer, self._counter_offset)[0]
+            if before == 0:
+                return None
+            if not before & 1:
+                values = self._frame.unpack_from(self._buffer, self._frame_offset)
+                if COUNTER.unpack_from(self._buffer, self._counter_offset)[0] == before:
+                    break
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError('No consistent gamepad state frame')
+
+        sequence, timestamp, length = values[:3]
+        axes_end = 3 + self._axis_count
+        buttons_end = axes_end + self._button_count
+        buttons = values[axes_end:buttons_end]
+        button_mask = 0
+        for index, pressed in enumerate(buttons):
+            if pressed:
+                button_mask |= 1 << index
+        return gamepad_state(sequence, timestamp, values[-1][:length],
+                             values[3:axes_end], buttons, button_mask)
+
+    def close(self):
+        if self._memory is not None:
+            self._buffer.release()
+            self._memory.close()
+            self._memory = None
+
+
+def _attach(name):
+    """Attaches to an existing segment without leaving it registered with the
+    resource tracker of an unrelated process, which would remove the segment
+    when the reader exits. The tracker keeps one entry per segment, so the
+    registration is kept for segments created in this process, whose entry
+    belongs to the publisher, and in child processes started by
+    multiprocessing, which share the tracker of their parent."""
+
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name)
+        if memory.name not in _created and multiprocessing.parent_process() is None:
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(memory._name, 'shared_memory')
+            except (ImportError, AttributeError):
+                pass
+        return memory
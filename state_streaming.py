@@ -0,0 +1,354 @@
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+from gamepad_events import gamepad_state
+
+
+MAGIC = b'HG'
+VERSION = 1
+
+FRAME_NAMES = 1
+FRAME_KEY = 2
+FRAME_DELTA = 3
+
+# magic, version, frame kind, device id, stream sequence, state timestamp in nanoseconds
+HEADER = struct.Struct('<2sBBHIQ')
+# key frame: axis count, button count, followed by the quantized axes and packed buttons
+KEY = struct.Struct('<HH')
+# delta frame: sequence of its key frame, number of changed axes, followed by the
+# packed buttons and the (axis index, quantized value) pairs of the changed axes
+DELTA = struct.Struct('<IH')
+CHANGED_AXIS = struct.Struct('<Hh')
+
+AXIS_SCALE = 32767
+MAX_DATAGRAM = 65507
+
+
+def quantize(value):
+    """Returns an axis value of the -1.0 to 1.0 range as a 16 bit integer."""
+
+    return max(-AXIS_SCALE, min(AXIS_SCALE, round(value * AXIS_SCALE)))
+
+
+def pack_buttons(buttons):
+    """Returns the button states packed into bytes, eight buttons per byte."""
+
+    packed = bytearray((len(buttons) + 7) // 8)
+    for index, pressed in enumerate(buttons):
+        if pressed:
+            packed[index >> 3] |= 1 << (index & 7)
+    return bytes(packed)
+
+
+def unpack_buttons(packed, count):
+    return tuple(bool(packed[index >> 3] & (1 << (index & 7))) for index in range(count))
+
+
+def _socket_for(address):
+    """Returns a datagram socket for a (host, port) UDP address or a Unix socket
+    path, and the resolved socket address, so the host name is only resolved once."""
+
+    if isinstance(address, (str, bytes, os.PathLike)):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM), address
+    family, _, _, _, sockaddr = socket.getaddrinfo(address[0], address[1], type=socket.SOCK_DGRAM)[0]
+    return socket.socket(family, socket.SOCK_DGRAM), sockaddr
+
+
+class state_publisher():
+    """Sends gamepad state snapshots as compact binary datagrams to UDP
+    addresses, given as (host, port) pairs, or Unix datagram socket paths.
+
+    Every "keyframe_interval" seconds the publisher sends the axis and button
+    names and a key frame with the whole state. The other states are sent as
+    delta frames holding the packed buttons and only the axes which differ
+    from the last key frame, so a lost datagram never corrupts the following
+    ones. Axes are quantized to 16 bits. Each frame carries the device id, a
+    stream sequence number, from which clients detect lost frames, and the
+    state timestamp."""
+
+    def __init__(self, destinations, axis_names, button_names, device_id=0, keyframe_interval=1.0):
+        if isinstance(destinations, (str, bytes, os.PathLike)) or (
+                isinstance(destinations, tuple) and len(destinations) == 2 and isinstance(destinations[1], int)):
+            destinations = [destinations]
+        self.destinations = list(destinations)
+        self.device_id = device_id
+        self.keyframe_interval = keyframe_interval
+        self._names = json.dumps({'axes': list(axis_names), 'buttons': list(button_names)}).encode()
+        self._sockets = {}
+        self._sequence = 0
+        self._key_sequence = None
+        self._key_axes = ()
+        self._key_time = 0
+        self.frames_sent = 0
+        self.send_errors = 0
+
+    def publish(self, state):
+        """Sends a "gamepad_state" as a key or delta frame."""
+
+        axes = [quantize(value) for value in state.axes]
+        now = time.monotonic()
+        if (self._key_sequence is None or len(axes) != len(self._key_axes)
+                or now - self._key_time >= self.keyframe_interval):
+            self._send_keyframe(state, axes, now)
+            return
+        changed = [(index, value) for index, value in enumerate(axes) if value != self._key_axes[index]]
+        frame = bytearray(self._header(FRAME_DELTA, state.timestamp))
+        frame += DELTA.pack(self._key_sequence, len(changed))
+        frame += pack_buttons(state.buttons)
+        for index, value in changed:
+            frame += CHANGED_AXIS.pack(index, value)
+        self._send(frame)
+
+    def send_keyframe(self, state):
+        """Sends the names and a key frame of "state" right away."""
+
+        self._send_keyframe(state, [quantize(value) for value in state.axes], time.monotonic())
+
+    def _send_keyframe(self, state, axes, now):
+        self._send(self._header(FRAME_NAMES, state.timestamp) + self._names)
+        self._key_sequence = (self._sequence + 1) & 0xFFFFFFFF
+        self._key_axes = axes
+        self._key_time = now
+        frame = self._header(FRAME_KEY, state.timestamp) + KEY.pack(len(axes), len(state.buttons))
+        frame += struct.pack(f'<{len(axes)}h', *axes) + pack_buttons(state.buttons)
+        self._send(frame)
+
+    def _header(self, kind, timestamp):
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        return HEADER.pack(MAGIC, VERSION, kind, self.device_id, self._sequence, timestamp)
+
+    def _send(self, frame):
+        for destination in self.destinations:
+            try:
+                target = self._sockets.get(destination)
+                if target is None:
+                    target = self._sockets[destination] = _socket_for(destination)
+                    target[0].setblocking(False)
+                sock, sockaddr = target
+                sock.sendto(frame, sockaddr)
+                self.frames_sent += 1
+            except OSError:
+                self.send_errors += 1
+
+    def close(self):
+        for sock, _ in self._sockets.values():
+            sock.close()
+        self._sockets = {}
+
+
+class state_client():
+    """Receives the frames of a "state_publisher" on a UDP address, given as
+    a (host, port) pair, or a Unix datagram socket path, and exposes the
+    remote gamepad through the same state API as a local "hid_gamepad":
+    "get_state", "get_axis_state", "get_button_state" and the name getters.
+
+    Only frames of "device_id" are used, or of the first device heard from if
+    it is None. Gaps in the stream sequence are counted in "frames_lost".
+    Frames are processed by "receive" or by a background thread started with
+    "start"."""
+
+    class receive_thread(threading.Thread):
+        """Thread receiving the frames of a client. One of these is created by
+        the client start function and closed by stop."""
+
+        def __init__(self, client, timeout):
+            threading.Thread.__init__(self)
+            self.client = client
+            self.timeout = timeout
+            self.daemon = True
+            self.running = True
+
+        def run(self):
+            try:
+                while self.running:
+                    self.client.receive(self.timeout)
+            finally:
+                self.running = False
+                self.client = None
+
+    def __init__(self, address, device_id=None):
+        self.address = address
+        self.device_id = device_id
+        self._socket, sockaddr = _socket_for(address)
+        if not isinstance(address, (str, bytes, os.PathLike)):
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(sockaddr)
+        self._axis_mapping = {}
+        self._button_mapping = {}
+        self._axis_names = []
+        self._button_names = []
+        self._key_sequence = None
+        self._key_axes = ()
+        self._last_sequence = None
+        self._state = gamepad_state(0, 0, b'', (), ())
+        self._lock = threading.Lock()
+        self._thread = None
+        self.frames_received = 0
+        self.frames_lost = 0
+        self.invalid_frames = 0
+
+    @property
+    def is_connected(self):
+        """True once a key frame of the remote gamepad has been received."""
+
+        return self._key_sequence is not None
+
+    def fileno(self):
+        return self._socket.fileno()
+
+    def receive(self, timeout=0):
+        """Processes the frames received within "timeout" seconds, or the
+        already pending ones if it is 0. Returns the number of processed frames."""
+
+        processed = 0
+        self._socket.settimeout(timeout)
+        while True:
+            try:
+                frame = self._socket.recv(MAX_DATAGRAM)
+            except OSError:
+                return processed
+            self._socket.settimeout(0)
+            if self.process_frame(frame):
+                processed += 1
+
+    def process_frame(self, frame):
+        """Applies one received frame. Returns False if the frame was ignored."""
+
+        if len(frame) < HEADER.size:
+            self.invalid_frames += 1
+            return False
+        magic, version, kind, device_id, sequence, timestamp = HEADER.unpack_from(frame, 0)
+        if magic != MAGIC or version != VERSION:
+            self.invalid_frames += 1
+            return False
+        if self.device_id is None:
+            self.device_id = device_id
+        elif device_id != self.device_id:
+            return False
+
+        with self._lock:
+            if self._last_sequence is not None:
+                # gaps of more than half the sequence range are reordered frames
+                gap = (sequence - self._last_sequence - 1) & 0xFFFFFFFF
+                if gap < 0x80000000:
+                    self.frames_lost += gap
+            self._last_sequence = sequence
+            self.frames_received += 1
+            try:
+                if kind == FRAME_NAMES:
+                    self._apply_names(frame[HEADER.size:])
+                elif kind == FRAME_KEY:
+                    self._apply_key(frame, sequence, timestamp)
+                elif kind == FRAME_DELTA:
+                    return self._apply_delta(frame, timestamp)
+                else:
+                    self.invalid_frames += 1
+                    return False
+            except (struct.error, ValueError, IndexError):
+                self.invalid_frames += 1
+                return False
+        return True
+
+    def _apply_names(self, data):
+        names = json.loads(data.decode())
+        self._axis_names = names['axes']
+        self._button_names = names['buttons']
+        self._axis_mapping = {name: index for index, name in enumerate(self._axis_names)}
+        self._button_mapping = {name: index for index, name in enumerate(self._button_names)}
+
+    def _apply_key(self, frame, sequence, timestamp):
+        axis_count, button_count = KEY.unpack_from(frame, HEADER.size)
+        position = HEADER.size + KEY.size
+        axes = struct.unpack_from(f'<{axis_count}h', frame, position)
+        position += 2 * axis_count
+        if position + (button_count + 7) // 8 > len(frame):
+            raise ValueError('Truncated key frame')
+        packed = frame[position:position + (button_count + 7) // 8]
+        self._key_sequence = sequence
+        self._key_axes = axes
+        self._publish(timestamp, axes, unpack_buttons(packed, button_count), int.from_bytes(packed, 'little'))
+
+    def _apply_delta(self, frame, timestamp):
+        key_sequence, changed = DELTA.unpack_from(frame, HEADER.size)
+        if key_sequence != self._key_sequence:
+            # the key frame this delta is based on was lost
+            return False
+        position = HEADER.size + DELTA.size
+        button_count = len(self._state.buttons)
+        packed_length = (button_count + 7) // 8
+        if position + packed_length > len(frame):
+            raise ValueError('Truncated delta frame')
+        packed = frame[position:position + packed_length]
+        position += packed_length
+        axes = list(self._key_axes)
+        for _ in range(changed):
+            index, value = CHANGED_AXIS.unpack_from(frame, position)
+            axes[index] = value
+            position += CHANGED_AXIS.size
+        self._publish(timestamp, axes, unpack_buttons(packed, button_count), int.from_bytes(packed, 'little'))
+        return True
+
+    def _publish(self, timestamp, axes, buttons, button_mask):
+        self._state = gamepad_state(self._state.sequence + 1, timestamp, b'',
+                                    tuple(value / AXIS_SCALE for value in axes), buttons, button_mask)
+
+    def get_state(self):
+        """Returns the latest "gamepad_state" of the remote gamepad. Raw inputs
+        are not streamed and are always empty."""
+
+        return self._state
+
+    def get_axis_state(self, axis_name):
+        """Returns the state of the axis specified by name or index. Throws
+        ValueError if the axis name or index cannot be found."""
+
+        try:
+            if axis_name in self._axis_mapping:
+                return self._state.axes[self._axis_mapping[axis_name]]
+            return self._state.axes[int(axis_name)]
+        except (IndexError, ValueError):
+            raise ValueError('Axis name %s was not found' % axis_name)
+
+    def get_button_state(self, button_name):
+        """Returns True if the button specified by name or index is pressed.
+        Throws ValueError if the button name or index cannot be found."""
+
+        try:
+            if button_name in self._button_mapping:
+                return self._state.buttons[self._button_mapping[button_name]]
+            return self._state.buttons[int(button_name)]
+        except (IndexError, ValueError):
+            raise ValueError('Button name %s was not found' % button_name)
+
+    def get_axis_names(self):
+        return self._axis_mapping.keys()
+
+    def get_button_names(self):
+        return self._button_mapping.keys()
+
+    def start(self, timeout=0.1):
+        """Starts a background thread receiving the frames."""
+
+        if self._thread is not None and self._thread.running:
+            raise RuntimeError('State client is already running')
+        self._thread = state_client.receive_thread(self, timeout)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.running = False
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._socket.close()
+        if isinstance(self.address, (str, bytes, os.PathLike)):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
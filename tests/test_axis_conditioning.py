@@ -0,0 +1,42 @@
+from axis_conditioning import axis_conditioning
+from hid_backends import synthetic_backend
+from microntek_gamepad import microntek_gamepad
+
+
+def report(ax1_x):
+    return bytes([1, ax1_x, 128, 128, 128, 0x0F, 0, 0])
+
+
+def connected_gamepad(reports):
+    backend = synthetic_backend(reports, device_info={'manufacturer_string': 'microntek'})
+    gamepad = microntek_gamepad(backend)
+    assert gamepad.connect(backend.enumerate()[0])
+    return gamepad
+
+
+def test_smoothed_axis_settles_when_the_stick_is_released_and_held_still():
+    gamepad = connected_gamepad([report(255)] * 3 + [report(128)] * 50)
+    gamepad.set_axis_conditioning('ax1_x', axis_conditioning(smoothing=0.5))
+    while gamepad.update_state():
+        pass
+    assert gamepad.get_axis_state('ax1_x') == 0.0
+
+
+def test_smoothing_follows_deflection_gradually():
+    gamepad = connected_gamepad([report(128), report(255), report(255)])
+    gamepad.set_axis_conditioning('ax1_x', axis_conditioning(smoothing=0.5))
+    gamepad.update_state()
+    gamepad.update_state()
+    first = gamepad.get_axis_state('ax1_x')
+    gamepad.update_state()
+    assert 0.0 < first < gamepad.get_axis_state('ax1_x') < 255 / 128 - 1
+
+
+def test_new_conditioning_applies_to_a_stick_held_still():
+    gamepad = connected_gamepad([report(140)] * 10)
+    gamepad.update_state()
+    assert gamepad.get_axis_state('ax1_x') == 0.09375
+    gamepad.set_axis_conditioning('ax1_x', axis_conditioning(deadzone=0.2))
+    while gamepad.update_state():
+        pass
+    assert gamepad.get_axis_state('ax1_x') == 0.0
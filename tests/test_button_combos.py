@@ -0,0 +1,52 @@
+from button_combos import combo_engine
+
+
+MS = 1000000
+A, B, C = 1, 2, 4
+
+
+def engine():
+    return combo_engine({'A': 0, 'B': 1, 'C': 2})
+
+
+def run(combos, presses):
+    """Feeds (milliseconds, button mask) reports and returns the fired combos."""
+
+    fired = []
+    for time_ms, mask in presses:
+        fired += combos.update(mask, time_ms * MS)
+    return fired
+
+
+def test_sequence_times_out_between_steps():
+    combos = engine()
+    combos.add_sequence('s', ['A', 'B'], timeout=0.1)
+    assert run(combos, [(0, A), (10, 0), (500, B), (510, 0)]) == []
+    assert run(combos, [(1000, A), (1010, 0), (1050, B)]) == ['s']
+
+
+def test_sequence_restarts_on_its_first_step_and_resets_on_other_buttons():
+    combos = engine()
+    combos.add_sequence('s', ['A', 'B'], timeout=0.5)
+    assert run(combos, [(0, A), (10, 0), (20, A), (30, 0), (40, B), (50, 0)]) == ['s']
+    assert run(combos, [(100, A), (110, 0), (120, C), (130, 0), (140, B), (150, 0)]) == []
+
+
+def test_sequence_chord_step_waits_for_the_whole_chord():
+    combos = engine()
+    combos.add_sequence('s', ['A', ['B', 'C']], timeout=0.5)
+    assert run(combos, [(0, A), (10, 0), (20, B)]) == []
+    assert run(combos, [(30, B | C)]) == ['s']
+
+
+def test_chord_pressed_outside_its_window_does_not_fire():
+    combos = engine()
+    combos.add_chord('c', ['A', 'B'], window=0.05)
+    assert run(combos, [(0, A), (200, A | B), (210, 0)]) == []
+    assert run(combos, [(1000, A), (1010, A | B)]) == ['c']
+
+
+def test_chord_without_window_fires_once_per_press():
+    combos = engine()
+    combos.add_chord('c', ['A', 'B'])
+    assert run(combos, [(0, A), (500, A | B), (510, A | B), (520, A), (530, A | B)]) == ['c', 'c']
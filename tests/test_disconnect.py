@@ -0,0 +1,45 @@
+import threading
+import time
+
+from hid_backends import paced_device, synthetic_backend
+from hid_gamepad import hid_gamepad
+
+
+class tracking_device(paced_device):
+    """Device blocking in reads like a physical one and recording a close
+    made while a read is in flight."""
+
+    def __init__(self):
+        super().__init__(iter(()), realtime=False)
+        self.reading = threading.Event()
+        self.closed_while_reading = False
+
+    def read(self, max_length, timeout_ms=0):
+        self.reading.set()
+        try:
+            time.sleep(timeout_ms / 1000)
+        finally:
+            self.reading.clear()
+        return []
+
+    def close(self):
+        self.closed_while_reading = self.reading.is_set()
+
+
+class tracking_backend(synthetic_backend):
+    def __init__(self):
+        super().__init__(())
+        self.device = tracking_device()
+
+    def open(self, target_device):
+        return self.device
+
+
+def test_disconnect_stops_the_update_thread_before_closing_the_device():
+    backend = tracking_backend()
+    gamepad = hid_gamepad(backend)
+    assert gamepad.connect(backend.enumerate()[0])
+    gamepad.start_asynchronous(timeout=0.05)
+    assert backend.device.reading.wait(1.0)
+    assert gamepad.disconnect()
+    assert not backend.device.closed_while_reading
@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from event_dispatcher import event_dispatcher
+from gamepad_events import AXIS_MOVED, BUTTON_DOWN, gamepad_event
+
+
+def move(sequence, value):
+    return gamepad_event(sequence, sequence, AXIS_MOVED, 'ax1_x', value)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_rate_limit_delivers_the_trailing_value():
+    dispatcher = event_dispatcher()
+    values = []
+    dispatcher.subscribe(lambda event: values.append(event.value), rate_limit=0.05)
+    dispatcher.start()
+    for sequence, value in enumerate((0.1, 0.2, 0.3, 0.4)):
+        dispatcher.post([move(sequence, value)])
+    try:
+        assert wait_for(lambda: values[-1:] == [0.4])
+        assert values == [0.1, 0.4]
+    finally:
+        dispatcher.stop()
+
+
+def test_executor_delivers_events_in_order_one_at_a_time():
+    executor = ThreadPoolExecutor(max_workers=4)
+    dispatcher = event_dispatcher(executor)
+    sequences = []
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def callback(event):
+        with lock:
+            running.append(event)
+            if len(running) > 1:
+                overlaps.append(event)
+        time.sleep(0.0005)
+        sequences.append(event.sequence)
+        with lock:
+            running.remove(event)
+
+    dispatcher.subscribe(callback, kinds=[BUTTON_DOWN])
+    for sequence in range(200):
+        dispatcher.post([gamepad_event(sequence, sequence, BUTTON_DOWN, 'A', True)])
+    try:
+        assert wait_for(lambda: len(sequences) == 200)
+        assert sequences == list(range(200))
+        assert not overlaps
+    finally:
+        executor.shutdown()
+
+
+def test_executor_keeps_the_trailing_value_under_concurrent_posts():
+    executor = ThreadPoolExecutor(max_workers=4)
+    dispatcher = event_dispatcher(executor)
+    values = []
+    dispatcher.subscribe(lambda event: values.append(event.value), rate_limit=0.02)
+    threads = [threading.Thread(target=lambda offset=offset: [
+        dispatcher.post([move(offset * 1000 + index, offset + index / 1000)]) for index in range(200)])
+        for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    dispatcher.post([move(10000, 9.0)])
+    try:
+        assert wait_for(lambda: values[-1:] == [9.0])
+    finally:
+        dispatcher.stop()
+        executor.shutdown()
+
+
+def test_gamepad_disconnect_stops_the_dispatcher_thread():
+    from hid_backends import synthetic_backend
+    from hid_gamepad import hid_gamepad
+
+    backend = synthetic_backend([bytes(8)] * 4)
+    gamepad = hid_gamepad(backend)
+    assert gamepad.connect(backend.enumerate()[0])
+    gamepad.subscribe(lambda event: None)
+    thread = gamepad._dispatcher._thread
+    assert gamepad.disconnect()
+    assert not thread.is_alive()
+    assert gamepad.reconnect()
+    assert gamepad._dispatcher.running
+    gamepad.disconnect()
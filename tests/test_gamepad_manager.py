@@ -0,0 +1,68 @@
+import os
+
+from gamepad_manager import gamepad_manager
+from hid_backends import synthetic_backend
+from hid_gamepad import hid_gamepad
+
+
+class pipe_device():
+    """Device reading reports from a pipe, so it can be waited on with the
+    selector, and failing like an unplugged device once "unplugged" is set."""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.unplugged = False
+
+    def fileno(self):
+        return self.read_fd
+
+    def send(self, report):
+        os.write(self.write_fd, report)
+
+    def read(self, max_length, timeout_ms=0):
+        if self.unplugged:
+            raise OSError('Device unplugged')
+        try:
+            return os.read(self.read_fd, 8)
+        except BlockingIOError:
+            return []
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class pipe_backend(synthetic_backend):
+    def __init__(self):
+        super().__init__(())
+        self.devices = []
+
+    def open(self, target_device):
+        self.devices.append(pipe_device())
+        return self.devices[-1]
+
+
+def test_reconnected_gamepad_keeps_its_consumers():
+    backend = pipe_backend()
+    gamepad = hid_gamepad(backend)
+    assert gamepad.connect(backend.enumerate()[0])
+    manager = gamepad_manager(timeout=0.01)
+    states = []
+    manager.add(gamepad, lambda gamepad, state, events: states.append(state.raw_inputs))
+
+    backend.devices[-1].send(bytes([1]) + bytes(7))
+    manager.run_once()
+    assert len(states) == 1
+
+    backend.devices[-1].unplugged = True
+    backend.devices[-1].send(bytes(8))
+    manager.run_once()
+    assert not gamepad.is_connected
+    assert gamepad in manager.gamepads
+
+    assert gamepad.reconnect()
+    backend.devices[-1].send(bytes([2]) + bytes(7))
+    manager.run_once()
+    manager.run_once()
+    assert states[-1] == bytes([2]) + bytes(7)
@@ -0,0 +1,31 @@
+from hid_gamepad import hid_gamepad
+from hid_recording import replay_backend, report_recorder, report_replay
+
+
+def record(path, count):
+    recorder = report_recorder(path, {'path': b'/dev/hidraw0', 'vendor_id': 1, 'product_id': 2,
+                                      'manufacturer_string': 'test', 'product_string': 'Joystick'})
+    for index in range(count):
+        recorder.write(bytes([index, 0, 0, 0]), index * 1000)
+    recorder.close()
+
+
+def test_replay_closes_while_an_iterator_is_suspended(tmp_path):
+    path = tmp_path / 'capture.hidrec'
+    record(path, 4)
+    replay = report_replay(path)
+    reports = iter(replay)
+    timestamp, report = next(reports)
+    assert (timestamp, bytes(report)) == (0, bytes(4))
+    reports.close()
+    replay.close()
+
+
+def test_replay_backend_closes_with_an_open_device(tmp_path):
+    path = tmp_path / 'capture.hidrec'
+    record(path, 4)
+    backend = replay_backend(path, realtime=False)
+    gamepad = hid_gamepad(backend)
+    assert gamepad.connect(backend.enumerate()[0])
+    assert gamepad.update_state()
+    backend.close()
@@ -0,0 +1,40 @@
+import threading
+
+from hid_backends import paced_device
+from output_queue import output_queue
+
+
+def test_flush_is_not_broken_by_a_concurrent_clear():
+    device = paced_device(iter(()))
+    queue = output_queue(min_interval=0.0)
+    queue.put(b'\x01\x02')
+    delay = queue.delay
+    clearing = []
+
+    def delay_then_clear(now=None):
+        # "disconnect" clears the queue from another thread right after the check
+        result = delay(now)
+        thread = threading.Thread(target=queue.clear)
+        thread.start()
+        thread.join(0.05)
+        clearing.append(thread)
+        return result
+
+    queue.delay = delay_then_clear
+    queue.flush(device)
+    for thread in clearing:
+        thread.join()
+    assert len(device.written) == 1
+    assert len(queue) == 0
+
+
+def test_flush_writes_the_latest_report_of_each_id():
+    device = paced_device(iter(()))
+    queue = output_queue(min_interval=0.0)
+    queue.put(b'\x01\x01')
+    assert queue.put(b'\x01\x02')
+    queue.put(b'\x02\x01', feature=True)
+    while queue.flush(device) is not None:
+        pass
+    assert [(kind, report) for _, kind, report in device.written] == [
+        ('output', b'\x01\x02'), ('feature', b'\x02\x01')]
@@ -0,0 +1,74 @@
+from hid_backends import paced_device, synthetic_backend
+from hid_gamepad import hid_gamepad
+
+
+class switching_backend(synthetic_backend):
+    """Synthetic backend whose devices can be replaced, like after a replug.
+    Devices are opened by path, or by ids when no path is given, and identify
+    themselves like hidraw devices do."""
+
+    def __init__(self, devices):
+        super().__init__([bytes(8)] * 10)
+        self.devices = devices
+        self.enumerations = 0
+
+    def enumerate(self):
+        self.enumerations += 1
+        return list(self.devices)
+
+    def open(self, target_device):
+        for info in self.devices:
+            if (info['path'] == target_device['path'] if target_device.get('path') else
+                    (info['vendor_id'], info['product_id']) ==
+                    (target_device['vendor_id'], target_device['product_id'])):
+                device = paced_device(iter(()), realtime=False)
+                device.info = info
+                return device
+        raise OSError('No such device')
+
+    def identify(self, device):
+        return device.info
+
+
+def pad(path, serial='', product_id=2):
+    return {'path': path, 'vendor_id': 1, 'product_id': product_id, 'serial_number': serial,
+            'interface_number': 0, 'manufacturer_string': 'test', 'product_string': 'Joystick'}
+
+
+def connected(devices, target=None):
+    backend = switching_backend(devices)
+    gamepad = hid_gamepad(backend)
+    assert gamepad.connect(target if target is not None else devices[0])
+    return backend, gamepad
+
+
+def test_reconnects_by_path_without_enumerating():
+    backend, gamepad = connected([pad(b'/dev/hidraw1')])
+    assert gamepad.reconnect()
+    assert backend.enumerations == 0
+
+
+def test_reconnects_a_device_connected_by_ids():
+    backend, gamepad = connected([pad(b'/dev/hidraw1')], {'vendor_id': 1, 'product_id': 2})
+    assert gamepad.reconnect()
+    assert gamepad.reconnect()
+
+
+def test_does_not_reopen_a_path_reused_by_another_device():
+    backend, gamepad = connected([pad(b'/dev/hidraw1')])
+    backend.devices = [pad(b'/dev/hidraw1', product_id=99)]
+    assert not gamepad.reconnect()
+
+
+def test_does_not_match_identical_pads_without_serial_number():
+    backend, gamepad = connected([pad(b'/dev/hidraw1')])
+    backend.devices = [pad(b'/dev/hidraw2')]
+    assert not gamepad.reconnect()
+    assert backend.enumerations == 0
+
+
+def test_finds_a_device_with_a_new_path_by_serial_number():
+    backend, gamepad = connected([pad(b'/dev/hidraw1', 'A1')])
+    backend.devices = [pad(b'/dev/hidraw1', 'B2'), pad(b'/dev/hidraw3', 'A1')]
+    assert gamepad.reconnect()
+    assert gamepad._device_info['path'] == b'/dev/hidraw3'
@@ -0,0 +1,38 @@
+from gamepad_events import gamepad_state
+from state_streaming import MAX_DATAGRAM, state_client, state_publisher
+
+
+def state(sequence, x, pressed):
+    return gamepad_state(sequence, sequence * 1000, b'', (x, 0.0), (pressed, False), int(pressed))
+
+
+def test_loopback_stream_counts_the_dropped_frame():
+    client = state_client(('127.0.0.1', 0))
+    publisher = state_publisher(client._socket.getsockname(), ['x', 'y'], ['A', 'B'])
+    try:
+        publisher.publish(state(1, 0.0, False))
+        assert client.receive(1.0) == 2
+        assert client.is_connected
+        assert list(client.get_axis_names()) == ['x', 'y']
+
+        publisher.publish(state(2, 0.5, True))
+        # drop the delta frame before the client processes it
+        client._socket.settimeout(1.0)
+        client._socket.recv(MAX_DATAGRAM)
+        publisher.publish(state(3, -0.25, False))
+        assert client.receive(1.0) == 1
+
+        assert client.frames_lost == 1
+        assert client.get_axis_state('x') == round(-0.25 * 32767) / 32767
+        assert client.get_button_state('A') is False
+    finally:
+        publisher.close()
+        client.close()
+
+
+def test_key_sequence_wraps_with_the_stream_sequence():
+    publisher = state_publisher(('127.0.0.1', 9), ['x'], [])
+    publisher._sequence = 0xFFFFFFFE
+    publisher.send_keyframe(state(1, 0.0, False)._replace(buttons=()))
+    publisher.close()
+    assert publisher._key_sequence == 0
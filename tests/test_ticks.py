@@ -0,0 +1,38 @@
+from gamepad_events import BUTTON_DOWN, BUTTON_UP
+from hid_backends import synthetic_backend
+from microntek_gamepad import microntek_gamepad
+
+
+def report(b_1):
+    return bytes([1, 128, 128, 128, 128, 0x1F if b_1 else 0x0F, 0, 0])
+
+
+def ticking_gamepad():
+    backend = synthetic_backend([], device_info={'manufacturer_string': 'microntek'})
+    gamepad = microntek_gamepad(backend)
+    assert gamepad.connect(backend.enumerate()[0])
+    gamepad.enable_ticks()
+    return gamepad
+
+
+def test_press_and_release_between_two_ticks_is_reported():
+    gamepad = ticking_gamepad()
+    gamepad.apply_report(report(True), 100)
+    gamepad.apply_report(report(False), 200)
+    tick = gamepad.get_tick(300)
+
+    mask = 1 << list(gamepad.get_button_names()).index('b_1')
+    assert tick.pressed == mask and tick.released == mask
+    assert [(event.kind, event.name) for event in tick.transitions] == [
+        (BUTTON_DOWN, 'b_1'), (BUTTON_UP, 'b_1')]
+    assert tick.state.button_mask == 0
+
+
+def test_states_after_the_tick_are_kept_for_the_next_one():
+    gamepad = ticking_gamepad()
+    gamepad.apply_report(report(True), 400)
+    tick = gamepad.get_tick(350)
+    assert tick.pressed == 0 and tick.transitions == ()
+    tick = gamepad.get_tick(500)
+    assert [event.kind for event in tick.transitions] == [BUTTON_DOWN]
+    assert tick.state.timestamp == 400